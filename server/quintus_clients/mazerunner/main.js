@@ -157,14 +157,31 @@ function renderAllForDebug(Q, sprite) {
 // for shine prototype/demo
 // -------------------------------
 
+// decodes a binary message from the server (see ShineProtocol.send_binary) into its json header object
+// - the arrays following the header get attached to the header object as typed arrays (views into the buffer, no copying)
+// - assumes a little-endian client (as the server sends little-endian array data)
+function decode_binary_message(buffer) {
+	var header_len = new DataView(buffer).getUint32(0, true);
+	var jsonObj = JSON.parse(new TextDecoder("utf-8").decode(new Uint8Array(buffer, 4, header_len)));
+	var offset = 4 + header_len;
+	for (var [name, dtype, shape] of jsonObj.arrays) {
+		var ArrayType = dtype == "int32" ? Int32Array : dtype == "float32" ? Float32Array : Float64Array;
+		var length = shape.reduce(function(a, b) { return a * b; }, 1);
+		jsonObj[name] = new ArrayType(buffer, offset, length);
+		offset += length * ArrayType.BYTES_PER_ELEMENT;
+		offset += (8 - offset % 8) % 8;
+	}
+	return jsonObj;
+}
+
 function onMessage(event) {
-	var json = event.data;
-	var jsonObj = JSON.parse(json);
+	var json = event.data instanceof ArrayBuffer ? null : event.data;
+	var jsonObj = json ? JSON.parse(json) : decode_binary_message(event.data);
 	if (jsonObj.seqNum != SEQ_NUM_EXPECTED) {
 		console.log("ERROR: seq num from server ("+jsonObj.seqNum+") incorrect! Expected "+SEQ_NUM_EXPECTED+"!")
 	}
 	++SEQ_NUM_EXPECTED;
-	console.log("Received from server: "+json);
+	console.log("Received from server: "+(json || "binary "+jsonObj.notify+" ("+event.data.byteLength+" bytes)"));
 	
 	if (jsonObj.msgType == "request") {
 		if (jsonObj.request == "hello") {
@@ -199,7 +216,11 @@ function onMessage(event) {
 		}
 		// a q-table update coming down
 		else if (jsonObj.notify == "q-table sync") {
-			AGENT.p.shineControls.qTable.set_table(jsonObj["qTable"]);
+			var q_table = AGENT.p.shineControls.qTable;
+			if (jsonObj["full"] !== false) {
+				q_table.set_table({});
+			}
+			q_table.update_rows(jsonObj["states"], jsonObj["qValues"], jsonObj["arrays"][0][2][1], jsonObj["version"]);
 		}
 		// a progress report -> for now just log
 		else if (jsonObj.notify == "algo progress") {
@@ -221,6 +242,7 @@ function resetButtons() {
 function connect() {
 	console.log("Connecting to pyrate server");
 	SOCKET = new WebSocket("ws://localhost:2017");
+	SOCKET.binaryType = "arraybuffer";
 	SOCKET.onmessage = onMessage;
 	document.getElementById('btt_connect').disabled = true;
 	for (id of BUTTON_LIST) {
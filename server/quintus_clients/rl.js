@@ -4,11 +4,25 @@
 function QTable(num_actions) {
     this.table = {}; // this is the table (lookup by state vector, e.g. this.table[(0, 3, 3.5, 8, 10)] -> list of n q-values where n=num-actions [])
     this.numActions = num_actions;
+    this.version = 0; // the version of the server's q-table that we are in sync with
 
     // used by the synchronization from server
     // table has to be a str-keyed dict where the strings represent the state-description-tuples (e.g. "(12, 34)") coming from the shine server
-    this.set_table = function(table) {
+    this.set_table = function(table, version) {
         this.table = table;
+        this.version = version || 0;
+    };
+
+    // used by the (binary) synchronization from server: only the rows that changed since the server's previous version
+    // - states is a flat typed array of (num-rows x dim_state) state components, q_values a flat typed array of (num-rows x num-actions)
+    //   q-values (see decode_binary_message)
+    // - if we missed a version, we keep the rows anyway (the server sends a full snapshot every now and then)
+    this.update_rows = function(states, q_values, dim_state, version) {
+        for (var i = 0, n = q_values.length / this.numActions; i < n; ++i) {
+            this.table[state_to_str(states.subarray(i * dim_state, (i + 1) * dim_state))] =
+                q_values.subarray(i * this.numActions, (i + 1) * this.numActions);
+        }
+        this.version = version;
     };
 
     // return the argmax(a) for a given state s represented as a string (representing a state-description-tuple e.g. "(12, 46)")
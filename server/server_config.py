@@ -18,4 +18,14 @@ SHINE_SERVER_MAX_LEN_USERNAME = 32  # the max len of a username for shine client
 SHINE_SERVER_MAX_LEN_PROJECT_NAME = 32  # the max len of a name for a Project (projects are stored under a unique-per-user name)
 SHINE_SERVER_MAX_ALGORITHM_NAME = 32  # the max len of a name for an Algorithm object (worlds are stored under a unique name per-user-per-project)
 SHINE_SERVER_MAX_LEN_WORLD_NAME = 32  # the max len of a name for a World object (algorithms are stored under a unique name per-user-per-project)
+SHINE_SERVER_MAX_Q_TABLE_VALUES = 4000000  # the max number of q-values (product of the stateSpaceShape dims x numActions) of an algorithm's dense q-table
 
+
+# learning settings
+SHINE_SERVER_REPLAY_MEMORY_DIR = None  # if set: directory under which the replay memories of new algorithms are stored as memory-mapped files (None=in RAM)
+SHINE_SERVER_NUM_ALGORITHM_THREADS = 4  # the max number of worker threads that run algorithms (off the reactor thread); runs of the same algorithm are queued
+SHINE_SERVER_ALGORITHM_EXECUTION = "threads"  # "threads": algorithm runs go to the worker thread pool; "time-sliced": they are stepped on the reactor thread
+SHINE_SERVER_SCHEDULER_TICK = 0.05  # time-sliced execution: seconds between two scheduler ticks
+SHINE_SERVER_SCHEDULER_TIME_BUDGET = 0.03  # time-sliced execution: seconds of algorithm work per tick (shared by all active runs)
+SHINE_SERVER_HOGWILD_START_METHOD = "forkserver"  # how HogwildQLearner runs start their worker processes (the server is multithreaded: don't fork it)
+SHINE_SERVER_MAX_NUM_PLANNING_STEPS = 100000  # the max number of planning steps a client may request for one run (options.numPlanningSteps)
@@ -21,10 +21,21 @@
 
 import logging as log
 from autobahn.twisted.websocket import WebSocketServerProtocol, WebSocketServerFactory
+from twisted.internet import reactor, threads, task
+from twisted.internet.defer import Deferred, DeferredLock, succeed
+from twisted.python.failure import Failure
+from twisted.python.threadable import isInIOThread
+from twisted.python.threadpool import ThreadPool
 import json  # our format for messaging
+import math
+import struct
+import numpy as np
 import server_config as conf  # PyRATE TCP server config
 import shine
 import sys
+import os
+import re
+import time
 
 
 # used for internal protocol related errors whose message text should not be communicated back to the client
@@ -52,6 +63,173 @@ class UserRecord(object):  # persistent.Persistent):
         self.projects = {}  # persistent.mapping.PersistentMapping()
         # dict with the different algorithms this user might have running (or ran in the past); key=algo Id (int) unique per user; value=an Algorithm object
         self.algorithms = {}  # persistent.mapping.PersistentMapping()
+        # the algorithm runs requested by this user; key=job Id (int) unique per user; value=a Job object
+        self.jobs = {}
+        self.nextJobId = 0
+
+
+class Job(object):
+    """
+     A requested run of an algorithm that can be paused, resumed, cancelled and queried for its status and throughput
+     - status is one of: queued, running, paused, cancelled, done, failed
+     - by default, a job gets paused when its client disconnects (unless keepRunning is set)
+    """
+
+    def __init__(self, job_id: int, algo, keep_running: bool=False):
+        self.id = job_id
+        self.algorithm = algo
+        self.keepRunning = keep_running  # keep running when the client disconnects?
+        self.status = "queued"
+        self.startTime = None
+        self.endTime = None
+        self.pauseTime = None  # when we got paused (None if we are not paused)
+        self.pausedSeconds = 0.0  # total time spent in pause
+        self.numUpdatesAtStart = 0
+        self.resumed = None  # a Deferred that fires once we get resumed or cancelled (while a paused run waits for it)
+
+    # to be called right before the algorithm starts running (see Project.run_algorithm and AlgorithmScheduler)
+    # - returns False if the job got cancelled while it was queued (the algorithm should then not be run at all)
+    def begin(self):
+        if self.status == "cancelled":
+            return False
+        self.numUpdatesAtStart = self.algorithm.numUpdates
+        self.startTime = time.time()
+        self.algorithm.reset_run_control()
+        # we may have been paused while queued
+        if self.status == "paused":
+            self.pauseTime = self.startTime
+            self.algorithm.pause()
+        else:
+            self.status = "running"
+        return True
+
+    # to be called once the algorithm's run is over
+    def end(self, failed=False):
+        self.endTime = time.time()
+        if failed:
+            self.status = "failed"
+        elif self.status != "cancelled":
+            self.status = "done"
+
+    def pause(self):
+        if self.status in ["queued", "running"]:
+            # a queued job starts paused (its pause time only counts from the start on, see begin)
+            if self.status == "running":
+                self.algorithm.pause()
+                self.pauseTime = time.time()
+            self.status = "paused"
+
+    def resume(self):
+        if self.status == "paused":
+            self.status = "running" if self.startTime is not None else "queued"
+            if self.pauseTime is not None:
+                self.pausedSeconds += time.time() - self.pauseTime
+            self.pauseTime = None
+            self.algorithm.resume()
+            self.fire_resumed()
+
+    def cancel(self):
+        if self.status in ["queued", "running", "paused"]:
+            if self.startTime is not None:
+                self.algorithm.cancel()
+            self.status = "cancelled"
+            self.fire_resumed()
+
+    # returns a Deferred that fires once this (paused) job gets resumed or cancelled
+    def wait_until_resumed(self):
+        self.resumed = Deferred()
+        return self.resumed
+
+    def fire_resumed(self):
+        if self.resumed is not None:
+            resumed, self.resumed = self.resumed, None
+            resumed.callback(None)
+
+    def is_active(self):
+        return self.status in ["queued", "running", "paused"]
+
+    # returns the number of updates done so far and the updates per second (not counting the time spent in pause)
+    def get_throughput(self):
+        if self.startTime is None:
+            return 0, 0.0
+        num_updates = self.algorithm.numUpdates - self.numUpdatesAtStart
+        now = self.endTime or time.time()
+        run_seconds = now - self.startTime - self.pausedSeconds - (now - self.pauseTime if self.pauseTime is not None else 0.0)
+        return num_updates, (num_updates / run_seconds if run_seconds > 0.0 else 0.0)
+
+    # the job's status as a json-serializable dict
+    def get_status(self):
+        num_updates, updates_per_second = self.get_throughput()
+        return {"jobId": self.id, "algorithmName": self.algorithm.name, "status": self.status, "numUpdates": num_updates,
+                "updatesPerSecond": updates_per_second}
+
+
+class AlgorithmScheduler(object):
+    """
+     Runs algorithms cooperatively on the reactor thread (an alternative to the worker thread pool)
+     - every tick, each active run gets a slice of the tick's time budget (see Algorithm.step), so that many algorithms share the CPU
+       fairly and the reactor still gets to do its I/O in between
+     - runs of the same algorithm are executed one after the other
+     - paused algorithms are skipped (they must not block the reactor)
+    """
+
+    def __init__(self, _reactor, tick_interval: float, time_budget: float):
+        self.tickInterval = tick_interval
+        self.timeBudget = time_budget
+        self.runs = {}  # key=Algorithm object; value=list of [options, job, deferred] (the first one is the current run)
+        self.loop = task.LoopingCall(self.tick)
+        self.loop.clock = _reactor
+
+    # adds a run of the given algorithm (as part of an optional Job)
+    # - options may also be a callable that returns the options once the run starts
+    # - returns a Deferred that fires once the run is done
+    def submit(self, algo, options, job=None):
+        d = Deferred()
+        self.runs.setdefault(algo, []).append([options, job, d])
+        if not self.loop.running:
+            self.loop.start(self.tickInterval, now=False)
+        return d
+
+    # steps each algorithm's current run for its share of the time budget
+    def tick(self):
+        time_slice = self.timeBudget / len(self.runs)
+        for algo, runs in list(self.runs.items()):
+            options, job, d = runs[0]
+            try:
+                if algo.currentRun is None:
+                    # cancelled while queued
+                    if job is not None and not job.begin():
+                        self.finish_run(algo, d)
+                        continue
+                    if job is None:
+                        algo.reset_run_control()
+                    algo.start(options() if callable(options) else options)
+                if not algo.notPausedEvent.is_set():
+                    continue
+                running = algo.step(time_slice)
+            except Exception:
+                algo.currentRun = None
+                if job is not None:
+                    job.end(failed=True)
+                self.finish_run(algo, d, Failure())
+                continue
+            if not running:
+                if job is not None:
+                    job.end()
+                self.finish_run(algo, d)
+        if len(self.runs) == 0:
+            self.loop.stop()
+
+    # removes the algorithm's current run and fires its Deferred
+    def finish_run(self, algo, d, failure=None):
+        runs = self.runs[algo]
+        runs.pop(0)
+        if len(runs) == 0:
+            del self.runs[algo]
+        if failure is not None:
+            d.errback(failure)
+        else:
+            d.callback(None)
 
 
 class Project(object):  # persistent.Persistent):
@@ -84,7 +262,12 @@ class Project(object):  # persistent.Persistent):
         self.algorithms = {}  # persistent.mapping.PersistentMapping()
         self.worlds = {}  # persistent.mapping.PersistentMapping()
 
+        # all algorithms in this project share one state->ID table
+        self.stateInterner = shine.StateInterner()
+
         self._v_ShineProtocol = None  # will be set whenever a project is 'set' (or new one created)
+        self._v_RunLocks = {}  # key=algo name; value=DeferredLock making sure that an algorithm only does one run at a time
+        self._v_PendingUploads = {}  # key=algo name; value=the options (incl. the experiences) of its last queued (not yet started) upload run
 
     # old execute code crap
 
@@ -177,19 +360,99 @@ class Project(object):  # persistent.Persistent):
             raise(Exception("%s" % str(e)))
 """
 
-    # TODO: this will be replaced by event-handling/multiprocessing
+    # adds uploaded experiences (and run options) to the algorithm's queued upload run, so that uploads that come in faster than the
+    # algorithm can process them don't pile up as separate runs
+    # - only uploads with the same run options get merged (their numPlanningSteps add up); an upload that starts a new episode is never
+    #   merged into the previous one (its steps would end up in the previous upload's episode)
+    # - returns False if the upload could not be merged: the caller then has to queue a run for it (with start_upload as its options)
+    def merge_upload(self, algo_name, options):
+        pending = self._v_PendingUploads.get(algo_name)
+        if pending is None or options.get("newEpisode", False) or not self.can_merge_upload_options(pending, options):
+            self._v_PendingUploads[algo_name] = options
+            return False
+        pending["experiences"] = pending["experiences"] + options["experiences"]
+        if "numPlanningSteps" in options:
+            pending["numPlanningSteps"] += options["numPlanningSteps"]
+        return True
+
+    # whether two uploads' run options are equal (except for their experiences and - if both give some - their numPlanningSteps)
+    @staticmethod
+    def can_merge_upload_options(options_a, options_b):
+        def other_options(options):
+            return {key: value for key, value in options.items() if key not in ["experiences", "numPlanningSteps"]}
+        return ("numPlanningSteps" in options_a) == ("numPlanningSteps" in options_b) and other_options(options_a) == other_options(options_b)
+
+    # returns the given options of a queued upload run (to be called when that run starts; later uploads then queue a new run)
+    def start_upload(self, algo_name, options):
+        if self._v_PendingUploads.get(algo_name) is options:
+            del self._v_PendingUploads[algo_name]
+        return options
+
+    # runs the given algorithm (optionally as part of a Job) on the threads of thread_pool
+    # - options may also be a callable that returns the options once the run starts
+    # - runs of the same algorithm are queued (an algorithm is not thread-safe), runs of different algorithms happen in parallel
+    # - a paused run gives its thread back to the pool and continues (on any free thread) once its job gets resumed or cancelled
+    # - returns a Deferred that fires (on the reactor thread) once the run is done
+    def run_algorithm(self, algo_name, options, thread_pool, job=None):
+        lock = self._v_RunLocks.setdefault(algo_name, DeferredLock())
+        return lock.run(self.execute_run, self.algorithms[algo_name], options, thread_pool, job)
+
+    # starts a run (see run_algorithm) once it got the algorithm's lock
+    def execute_run(self, algo, options, thread_pool, job):
+        if job is not None:
+            # cancelled while queued
+            if not job.begin():
+                return succeed(None)
+        else:
+            # clear a pause or cancel that a previous job may have left behind (as AlgorithmScheduler.tick does)
+            algo.reset_run_control()
+        algo.start(options() if callable(options) else options)
+        d = self.continue_run(algo, thread_pool, job)
+
+        def run_done(result):
+            if job is not None:
+                job.end(failed=isinstance(result, Failure))
+            if isinstance(result, Failure):
+                algo.currentRun = None
+            return result
+        return d.addBoth(run_done)
+
+    # steps the algorithm's current run in a thread of thread_pool until it is done or paused
+    # - a paused run waits (without a thread) for its job to get resumed or cancelled
+    def continue_run(self, algo, thread_pool, job):
+        if job is not None and not algo.notPausedEvent.is_set():
+            return job.wait_until_resumed().addCallback(lambda _: self.continue_run(algo, thread_pool, job))
+        d = threads.deferToThreadPool(reactor, thread_pool, algo.step, float("inf"))
+        return d.addCallback(lambda running: self.continue_run(algo, thread_pool, job) if running else None)
+
+    # gets called by our algorithms (possibly from a worker thread, see run_algorithm)
+    # - hands the event over to the reactor thread as the protocol must only be used from there
     def algorithm_callback(self, obj):
+        if isInIOThread():
+            self.handle_algorithm_event(obj)
+        else:
+            reactor.callFromThread(self.handle_algorithm_event, obj)
+
+    # forwards an algorithm event (progress, q-table sync, etc..) to the client (if one is connected to this project)
+    def handle_algorithm_event(self, obj):
         assert "event" in obj, "no 'event' field in object in algo-callback!"
         assert "algorithmName" in obj, "no 'algorithmName' field in object in algo-callback!"
         event = obj["event"]
         algo_name = obj["algorithmName"]
         assert algo_name in self.algorithms
+        if self._v_ShineProtocol is None:
+            return
         if event == "progress":
             assert "pct" in obj, "no 'pct' field in object in algo-callback (event=progress)!"
             self._v_ShineProtocol.send_json({"notify": "algo progress", "pct": obj["pct"], "projectName": self.name, "algorithm": algo_name})
         elif event == "qTableSync":
-            assert "qTable" in obj, "no 'qTable' field in object in algo-callback (event=qTable)!"
-            self._v_ShineProtocol.send_json({"notify": "q-table sync", "qTable": obj["qTable"], "projectName": self.name, "algorithm": algo_name})
+            assert "states" in obj and "qValues" in obj, "no 'states' or 'qValues' field in object in algo-callback (event=qTableSync)!"
+            # full=False: the rows only hold the states that changed since the previous version
+            states = obj["states"]
+            states = states.astype(np.int32 if np.issubdtype(states.dtype, np.integer) else np.float64)
+            self._v_ShineProtocol.send_binary({"notify": "q-table sync", "version": obj.get("version", 0), "full": obj.get("full", True),
+                                               "projectName": self.name, "algorithm": algo_name},
+                                              states=states, qValues=obj["qValues"].astype(np.float32))
 
 
 class ShineProtocol(WebSocketServerProtocol):
@@ -211,6 +474,10 @@ class ShineProtocol(WebSocketServerProtocol):
         "add experience": "request_add_experience",
         "new algorithm": "request_new_algorithm",
         "run algorithm": "request_run_algorithm",
+        "pause job": "request_pause_job",
+        "resume job": "request_resume_job",
+        "cancel job": "request_cancel_job",
+        "get job status": "request_get_job_status",
         # "execute code": "requestExecuteCode",
     }
     # the response handlers
@@ -264,11 +531,14 @@ class ShineProtocol(WebSocketServerProtocol):
         if self.id in self.factory.protocols:
             del (self.factory.protocols[self.id])
             log.debug("removed id=%d from factory hash (new len=%d)" % (self.id, len(self.factory.protocols)))
+        # algorithms that are still running must not send to this connection anymore
+        if self.currentProject is not None and self.currentProject._v_ShineProtocol is self:
+            self.currentProject._v_ShineProtocol = None
+        # pause all still running jobs (unless the client asked us to keep them running)
         if self.userRecord:
-            pass
-            # TODO: algos are not pausable yet
-            # for algo_id, algo in self.userRecord.algorithms.items():
-            #    algo.pause()
+            for job in self.userRecord.jobs.values():
+                if not job.keepRunning:
+                    job.pause()
 
     # called whenever a (finished) message string (of the len given by the preceding size-marker) has been received
     # - this string is passed into this method without the size marker
@@ -447,6 +717,10 @@ class ShineProtocol(WebSocketServerProtocol):
         self.currentProject = project_obj
         # create a volatile pointer to this protocol for protocol/protocol-factory access
         self.currentProject._v_ShineProtocol = self
+        # this client may have missed some q-table deltas
+        for algo in self.currentProject.algorithms.values():
+            if isinstance(algo, shine.BasicQLearner):
+                algo.request_full_sync()
 
     # gets currentProject
     def request_get_project(self, json_obj):
@@ -504,12 +778,65 @@ class ShineProtocol(WebSocketServerProtocol):
             (num_actions > 1, ShineProtocol.PROTOCOL_ERROR_INVALID_FIELD_VALUE, False, "numActions"),
         ])
 
+        # optional: a bounded, discrete state space (e.g. [width, height] of a maze) -> use a dense (array) q-table
+        state_space_shape = json_obj.get("stateSpaceShape")
+        self.sanity_check_message(json_obj, [
+            (state_space_shape is None or (isinstance(state_space_shape, list) and len(state_space_shape) > 0 and
+                                           all(isinstance(dim, int) and dim > 0 for dim in state_space_shape)),
+                ShineProtocol.PROTOCOL_ERROR_FIELD_HAS_WRONG_TYPE, False, "stateSpaceShape", "list of positive ints"),
+        ])
+        self.sanity_check_message(json_obj, [
+            # the dense table gets allocated right away (no client may make us allocate arbitrary amounts of memory)
+            (state_space_shape is None or math.prod(state_space_shape) * num_actions <= conf.SHINE_SERVER_MAX_Q_TABLE_VALUES,
+                ShineProtocol.PROTOCOL_ERROR_CUSTOM, False, "Fields 'stateSpaceShape' and 'numActions' make for too many q-values "
+                "(allowed are max. {:d})!".format(conf.SHINE_SERVER_MAX_Q_TABLE_VALUES)),
+            # hogwild workers share a dense q-table
+            (state_space_shape is not None or not issubclass(getattr(sys.modules['shine'], algo_class), shine.HogwildQLearner),
+                ShineProtocol.PROTOCOL_ERROR_FIELD_MISSING, False, "stateSpaceShape"),
+        ])
+
+        # optional: the world whose states this algorithm learns from (determines the state layout of a disk-backed replay memory)
+        world_name = json_obj.get("worldName")
+        self.sanity_check_message(json_obj, [
+            (world_name is None or world_name in self.currentProject.worlds, ShineProtocol.PROTOCOL_ERROR_ITEM_DOESNT_EXIST, False,
+                "World '{}'".format(world_name), "project '{:s}'".format(self.currentProject.name)),
+        ])
+
         # generate the new project in our userRecord
         algo = getattr(sys.modules['shine'], algo_class)(algo_name, self.currentProject.algorithm_callback)
 
         # TODO: replace these calls with "set hyperparameters" (this is hardcoded right now to a certain algorithm)
-        algo.qFunction = shine.QTable(num_actions)
         algo.model = shine.TabularDeterministicWorldModel(num_actions)
+        if state_space_shape is not None:
+            # the dense table indexes by the actual state values (no interned IDs)
+            # (in shared memory, if the algorithm's worker processes need to update it)
+            q_table_class = shine.SharedDenseQTable if isinstance(algo, shine.HogwildQLearner) else shine.DenseQTable
+            algo.qFunction = q_table_class(tuple(state_space_shape), num_actions)
+            if isinstance(algo, shine.HogwildQLearner):
+                # the workers' shared memory holds states of the table's dimension
+                algo.replayMemory = shine.SharedRingBufferReplayMemory(len(state_space_shape), algo.replayMemory.maxSize, np.int32)
+                # runs execute on a pool thread: forking this (multithreaded) process could hand the workers locks that are held by other threads
+                algo.startMethod = conf.SHINE_SERVER_HOGWILD_START_METHOD
+        else:
+            algo.qFunction = shine.QTable(num_actions)
+            if isinstance(algo, shine.BasicQLearner):
+                algo.stateInterner = self.currentProject.stateInterner
+        # keep uniform replay memories on disk (survives server restarts), if configured
+        # - the column files need a fixed state layout: integer states of the dense table's dimension or the states of a given world
+        #   (stored as float64, so no state values get truncated); otherwise, the memory stays in RAM
+        if conf.SHINE_SERVER_REPLAY_MEMORY_DIR is not None and isinstance(algo.replayMemory, shine.ReplayMemory):
+            if state_space_shape is not None:
+                state_layout = (len(state_space_shape), "int32")
+            elif world_name is not None:
+                state_layout = (self.currentProject.worlds[world_name].dimState, "float64")
+            else:
+                state_layout = None
+                log.info("Keeping the replay memory of algorithm '{:s}' in RAM (no stateSpaceShape or worldName given)".format(algo_name))
+            if state_layout is not None:
+                directory = os.path.join(conf.SHINE_SERVER_REPLAY_MEMORY_DIR, *[re.sub(r"[^\w\-]", "_", name) for name in
+                                                                                [self.userName, self.currentProject.name, algo_name]])
+                algo.replayMemory = shine.MemoryMappedReplayMemory(directory, state_layout[0], algo.replayMemory.maxSize,
+                                                                   state_dtype=state_layout[1])
 
         self.currentProject.algorithms[algo_name] = algo
         return self.send_json({"response": "new algorithm created", "algorithmName": algo_name, "algorithmClass": algo_class})
@@ -529,12 +856,14 @@ class ShineProtocol(WebSocketServerProtocol):
             ("experienceList" in json_obj, ShineProtocol.PROTOCOL_ERROR_FIELD_MISSING, False, "experienceList"),
             (isinstance(json_obj["experienceList"], list), ShineProtocol.PROTOCOL_ERROR_FIELD_HAS_WRONG_TYPE, False, "experienceList", "list"),
         ])
+        self.sanity_check_run_options(json_obj)
 
         algo_name = json_obj["algorithmName"]
-        algo = self.currentProject.algorithms[algo_name]
 
         # type checking of single items
         client_items = json_obj["experienceList"]
+        replay_memory = self.currentProject.algorithms[algo_name].replayMemory
+        dim_state = replay_memory.dimState if isinstance(replay_memory, shine.RingBufferReplayMemory) else None
         experiences = []  # will be added to the ReplayMemory
         try:
             for i, item in enumerate(client_items):
@@ -548,12 +877,24 @@ class ShineProtocol(WebSocketServerProtocol):
                         "2nd element of item {:d} in experienceList".format(i), "float or int"),
                     (isinstance(item[3], list), ShineProtocol.PROTOCOL_ERROR_FIELD_HAS_WRONG_TYPE, False,
                         "3rd element of item {:d} in experienceList".format(i), "list"),
+                    # memories with state columns only take states of their dimension
+                    (dim_state is None or not isinstance(item[0], list) or not isinstance(item[3], list) or
+                        len(item[0]) == len(item[3]) == dim_state, ShineProtocol.PROTOCOL_ERROR_INVALID_FIELD_VALUE, False,
+                        "item {:d} in experienceList".format(i)),
                 ])
                 experiences.append([tuple(item[0]), item[1], float(item[2]), tuple(item[3])])  # make s and s' tuples so we can look them up in table
         except ShineProtocolClientMessageError as e:
             return self.send_json({"response": "error", "errMsg": str(e)})
 
-        algo.run(options={"experiences": experiences})
+        # optional per-upload run options (e.g. numPlanningSteps for a DynaQLearner)
+        options = dict(json_obj.get("options", {}))
+        options["experiences"] = experiences
+        # at most one upload run per algorithm waits in the queue (later uploads get merged into it)
+        if self.currentProject.merge_upload(algo_name, options):
+            return
+        project = self.currentProject
+        d = self.run_algorithm(algo_name, lambda: project.start_upload(algo_name, options))
+        d.addErrback(self.algorithm_run_failed, algo_name)
 
     # runs an algorithm on a world
     # TODO: for now: give a callback (a method of this Protocol) to the algo so we get called whenever the algo reaches some progress, is done, etc..
@@ -563,16 +904,95 @@ class ShineProtocol(WebSocketServerProtocol):
             (self.currentProject is not None, ShineProtocol.PROTOCOL_ERROR_NO_PROJECT_SET, False, "Cannot run algorithm."),
             (json_obj["algorithmName"] in self.currentProject.algorithms, ShineProtocol.PROTOCOL_ERROR_ITEM_DOESNT_EXIST, False,
                 "Algorithm '{:s}'".format(json_obj["algorithmName"]), "project '{:s}'".format(self.currentProject.name)),
-            (("options" not in json_obj) or isinstance(json_obj["options"], dict), ShineProtocol.PROTOCOL_ERROR_FIELD_HAS_WRONG_TYPE, False, "options", "dict"),
+            (("keepRunning" not in json_obj) or isinstance(json_obj["keepRunning"], bool), ShineProtocol.PROTOCOL_ERROR_FIELD_HAS_WRONG_TYPE, False,
+                "keepRunning", "bool"),
         ])
+        self.sanity_check_run_options(json_obj)
 
-        # run the algo in the project
+        # run the algo in the project (as a new job in a worker thread)
         algo_name = json_obj["algorithmName"]
-        # TODO: support for multiprocessing algorithm runs
-        algo = self.currentProject.algorithms[algo_name]
-        algo.run(json_obj["options"])
+        job = Job(self.userRecord.nextJobId, self.currentProject.algorithms[algo_name], json_obj.get("keepRunning", False))
+        self.userRecord.jobs[job.id] = job
+        self.userRecord.nextJobId += 1
+        d = self.run_algorithm(algo_name, json_obj.get("options", {}), job)
+        d.addCallback(self.algorithm_run_completed, algo_name, job)
+        d.addErrback(self.algorithm_run_failed, algo_name)
+
+        return self.send_json({"response": "job started", "jobId": job.id, "algorithmName": algo_name})
+
+    # checks the (optional) options field of a request, whose values get passed into an algorithm's run
+    # - only known options are allowed and numPlanningSteps is bounded (so that no client can keep an algorithm busy for an arbitrarily long time)
+    def sanity_check_run_options(self, json_obj):
+        options = json_obj.get("options", {})
+        self.sanity_check_message(json_obj, [
+            (isinstance(options, dict), ShineProtocol.PROTOCOL_ERROR_FIELD_HAS_WRONG_TYPE, False, "options", "dict"),
+        ])
+        num_planning_steps = options.get("numPlanningSteps", 0)
+        self.sanity_check_message(json_obj, [
+            (all(key in ["numPlanningSteps", "newEpisode"] for key in options), ShineProtocol.PROTOCOL_ERROR_INVALID_FIELD_VALUE, False, "options"),
+            (isinstance(num_planning_steps, int) and not isinstance(num_planning_steps, bool), ShineProtocol.PROTOCOL_ERROR_FIELD_HAS_WRONG_TYPE, False,
+                "options.numPlanningSteps", "int"),
+            (isinstance(options.get("newEpisode", False), bool), ShineProtocol.PROTOCOL_ERROR_FIELD_HAS_WRONG_TYPE, False, "options.newEpisode", "bool"),
+        ])
+        self.sanity_check_message(json_obj, [
+            (0 <= num_planning_steps <= conf.SHINE_SERVER_MAX_NUM_PLANNING_STEPS, ShineProtocol.PROTOCOL_ERROR_CUSTOM, False,
+                "Field 'options.numPlanningSteps' must be between 0 and {:d}!".format(conf.SHINE_SERVER_MAX_NUM_PLANNING_STEPS)),
+        ])
+
+    # runs an algorithm of the current project (optionally as part of a Job) in the way given by SHINE_SERVER_ALGORITHM_EXECUTION
+    # - returns a Deferred that fires (on the reactor thread) once the run is done
+    def run_algorithm(self, algo_name, options, job=None):
+        if conf.SHINE_SERVER_ALGORITHM_EXECUTION == "time-sliced":
+            return self.factory.algorithmScheduler.submit(self.currentProject.algorithms[algo_name], options, job)
+        return self.currentProject.run_algorithm(algo_name, options, self.factory.algorithmThreadPool, job)
+
+    # gets called (on the reactor thread) when a requested algorithm run is done
+    def algorithm_run_completed(self, _, algo_name, job):
+        if self.is_connected():
+            self.send_json({"notify": "algorithm completed", "algorithmName": algo_name, "jobId": job.id, "status": job.status})
 
-        return self.send_json({"notify": "algorithm completed", "algorithmName": algo_name})
+    # returns the job (of the current user) given by the jobId field of a request
+    def get_job(self, json_obj):
+        self.sanity_check_message(json_obj, [
+            ("jobId" in json_obj, ShineProtocol.PROTOCOL_ERROR_FIELD_MISSING, False, "jobId"),
+        ])
+        self.sanity_check_message(json_obj, [
+            (isinstance(json_obj["jobId"], int), ShineProtocol.PROTOCOL_ERROR_FIELD_HAS_WRONG_TYPE, False, "jobId", "int"),
+        ])
+        self.sanity_check_message(json_obj, [
+            (json_obj["jobId"] in self.userRecord.jobs, ShineProtocol.PROTOCOL_ERROR_ITEM_DOESNT_EXIST, False,
+                "Job {:d}".format(json_obj["jobId"]), "your user account"),
+        ])
+        return self.userRecord.jobs[json_obj["jobId"]]
+
+    # pauses a running (or queued) job
+    def request_pause_job(self, json_obj):
+        job = self.get_job(json_obj)
+        job.pause()
+        return self.send_json({"response": "job status", "job": job.get_status()})
+
+    # resumes a paused job
+    def request_resume_job(self, json_obj):
+        job = self.get_job(json_obj)
+        job.resume()
+        return self.send_json({"response": "job status", "job": job.get_status()})
+
+    # cancels a job (it will stop at its next checkpoint)
+    def request_cancel_job(self, json_obj):
+        job = self.get_job(json_obj)
+        job.cancel()
+        return self.send_json({"response": "job status", "job": job.get_status()})
+
+    # sends back a job's status and throughput
+    def request_get_job_status(self, json_obj):
+        job = self.get_job(json_obj)
+        return self.send_json({"response": "job status", "job": job.get_status()})
+
+    # gets called (on the reactor thread) when an algorithm's run raised an error
+    def algorithm_run_failed(self, failure, algo_name):
+        log.error("Algorithm '{:s}' failed: {:s}".format(algo_name, failure.getTraceback()))
+        if self.is_connected():
+            self.send_json({"notify": "error", "errMsg": "Algorithm '{:s}' failed: {:s}".format(algo_name, failure.getErrorMessage())})
 
     # method for when a client requests 'code execution' in a request message
     # - this method sounds scary, but it's very controlled and only allowed commands will be executed
@@ -650,14 +1070,7 @@ class ShineProtocol(WebSocketServerProtocol):
     # sends a pyrate-protocol compatible json message of the given type to the client
     # - all fields in the message have to be given in the jsonObj, except for origin, seqNum and msgType
     def send_json(self, json_obj):
-        assert (isinstance(json_obj, dict))
-        msg_type = "response" if "response" in json_obj else "request" if "request" in json_obj else "notify" if "notify" in json_obj else None
-        assert msg_type
-        # add some defaults to json object
-        json_obj["origin"] = "server"
-        json_obj["seqNum"] = self.nextSendSeqNum
-        json_obj["msgType"] = msg_type
-        self.nextSendSeqNum += 1
+        self.add_message_defaults(json_obj)
         try:
             msg = json.dumps(json_obj)
             log.debug("Will send json: %s" % msg)
@@ -668,6 +1081,38 @@ class ShineProtocol(WebSocketServerProtocol):
             # self.sendString(msg.encode('utf-8'))
             self.sendMessage(msg.encode('utf-8'))
 
+    # sends a binary message to the client: a pyrate-protocol compatible json header (same rules as for send_json) followed by the given
+    # numpy arrays
+    # - frame layout: uint32 length of the header, the utf-8 json header, then the raw little-endian array data; the header and each array
+    #   are padded to a multiple of 8 bytes so the client can view the arrays in place (e.g. as a Float32Array)
+    # - the header's "arrays" field lists [name, dtype, shape] for each array in the order in which they appear in the frame
+    def send_binary(self, json_obj, **arrays):
+        self.add_message_defaults(json_obj)
+        json_obj["arrays"] = []
+        data = []
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+            json_obj["arrays"].append([name, array.dtype.name, list(array.shape)])
+            data.append(array.tobytes() + b"\0" * (-array.nbytes % 8))
+        header = json.dumps(json_obj).encode('utf-8')
+        header += b" " * (-(4 + len(header)) % 8)
+        log.debug("Will send binary message: %s (+%d bytes of array data)" % (header, sum(len(d) for d in data)))
+        self.sendMessage(struct.pack("<I", len(header)) + header + b"".join(data), isBinary=True)
+
+    # adds the origin, seqNum and msgType fields to an outgoing message
+    def add_message_defaults(self, json_obj):
+        assert (isinstance(json_obj, dict))
+        msg_type = "response" if "response" in json_obj else "request" if "request" in json_obj else "notify" if "notify" in json_obj else None
+        assert msg_type
+        json_obj["origin"] = "server"
+        json_obj["seqNum"] = self.nextSendSeqNum
+        json_obj["msgType"] = msg_type
+        self.nextSendSeqNum += 1
+
+    # whether the websocket connection to the client is (still) open
+    def is_connected(self):
+        return self.state == WebSocketServerProtocol.STATE_OPEN
+
     # can be called if the connection shows suspicious behavior from the client side (protocol aberrations, etc..)
     def abort(self, err_msg=None):
         self.transport.abortConnection()
@@ -695,6 +1140,12 @@ class ShineProtocolFactory(WebSocketServerFactory):
         # self.jsonAlgoList = json_algo_dict
         self.nextProtocolId = 0
         self.protocols = {}  # store our protocols by ID
+        # the worker threads that run the algorithms (so that the reactor thread stays responsive)
+        self.algorithmThreadPool = ThreadPool(minthreads=1, maxthreads=conf.SHINE_SERVER_NUM_ALGORITHM_THREADS, name="shine algorithms")
+        self.algorithmThreadPool.start()
+        self.reactor.addSystemEventTrigger("before", "shutdown", self.stop_algorithms)
+        # or: step all algorithms cooperatively on the reactor thread
+        self.algorithmScheduler = AlgorithmScheduler(self.reactor, conf.SHINE_SERVER_SCHEDULER_TICK, conf.SHINE_SERVER_SCHEDULER_TIME_BUDGET)
 
     # this function is automatically defined via the c'tor given in static field 'protocol'
     def buildProtocol(self, _):  # _=factory
@@ -706,6 +1157,16 @@ class ShineProtocolFactory(WebSocketServerFactory):
         log.debug("Added %d to protocols dict" % _id)
         return protocol
 
+    # cancels all jobs and algorithm runs (they stop at their next checkpoint) and then stops (joins) the worker threads
+    def stop_algorithms(self):
+        for user_record in self.zodbRoot["Users"].values():
+            for job in user_record.jobs.values():
+                job.cancel()
+            for project in user_record.projects.values():
+                for algo in project.algorithms.values():
+                    algo.cancel()
+        self.algorithmThreadPool.stop()
+
     def shutdown_all(self):
         for _id, protocol in self.protocols.items():
             if isinstance(protocol, ShineProtocol):
@@ -8,9 +8,16 @@
 """
 
 import random
-from typing import List, Callable, Union
-from abc import ABCMeta, abstractmethod
+import os
+import json
+import threading
+import itertools
 import queue
+import heapq
+import time
+import multiprocessing
+from typing import List, Callable, Union, Iterator
+from abc import ABCMeta, abstractmethod
 from collections import namedtuple
 
 import tensorflow as tf
@@ -27,12 +34,34 @@ contains:
 """
 
 
+# a batch of sampled sars' transitions as contiguous column arrays (plus the indices under which the transitions are stored)
+SampleBatch = namedtuple("SampleBatch", ["states", "actions", "rewards", "next_states", "indices"])
+
+
+class SharedArray(object):
+    """
+    a numpy array in shared memory (a lock-free multiprocessing.RawArray)
+    - can be handed to worker processes (e.g. as a Process argument), which then all read and write the same memory
+    """
+
+    def __init__(self, shape: tuple, dtype):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.buffer = multiprocessing.RawArray("b", max(int(np.prod(self.shape)) * self.dtype.itemsize, 1))
+
+    # returns a numpy view on the shared memory
+    def get_array(self) -> np.ndarray:
+        return np.frombuffer(self.buffer, dtype=self.dtype, count=int(np.prod(self.shape))).reshape(self.shape)
+
+
 class ReplayMemory(object):
     """
     stores sars' transitions (items)
     - erases old items once a given maxSize is reached (set to 0 for unlimited storage)
     """
 
+    storesPythonObjects = True  # items are kept as python objects (so s and s' may just as well be interned state IDs)
+
     # initializes the storage
     # max_size: when more than max_size items are in the storage, erase old ones
     # items: list of initial items
@@ -46,60 +75,844 @@ class ReplayMemory(object):
     # - erases old items if we reach the maxSize so that we have exactly maxSize items left
     def add_items(self, items: List[tuple]):
         self.items.extend(items)
-        if len(self.items) > self.maxSize:
-            self.items = self.items[-self.maxSize:]  # prune the item storage
+        if 0 < self.maxSize < len(self.items):
+            del self.items[:len(self.items) - self.maxSize]  # prune the item storage (in place)
 
     # returns n randomly selected items from the storage
     def get_random_items(self, num_items: int) -> List[tuple]:
         return random.sample(self.items, min(num_items, len(self.items)))
 
+    # returns an index array of n randomly selected (distinct) items
+    def get_random_indices(self, num_items: int) -> np.ndarray:
+        return np.array(random.sample(range(len(self.items)), min(num_items, len(self.items))), dtype=np.int64)
+
+    # returns the items stored under the given indices as a SampleBatch of column arrays
+    def get_batch(self, indices: np.ndarray) -> SampleBatch:
+        return self.items_to_batch([self.items[i] for i in indices], indices)
+
+    # converts a list of sars' items into a SampleBatch of column arrays
+    # - states/next_states have the shape (n, World.dimState) (or (n,) if the states are interned IDs)
+    @staticmethod
+    def items_to_batch(items: List[tuple], indices: np.ndarray) -> SampleBatch:
+        if len(items) == 0:
+            return SampleBatch(np.zeros((0, 0)), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32), np.zeros((0, 0)), indices)
+        s, a, r, s_ = zip(*items)
+        return SampleBatch(np.array(s), np.array(a, dtype=np.int32), np.array(r, dtype=np.float32), np.array(s_), indices)
+
+    # returns n randomly selected items from the storage as a SampleBatch of column arrays
+    def sample_batch(self, num_items: int) -> SampleBatch:
+        return self.get_batch(self.get_random_indices(num_items))
+
     # returns the len of our storage list
     def __len__(self):
         return len(self.items)
 
 
-class PriorityReplayMemory(object):
+class ReservoirReplayMemory(ReplayMemory):
     """
-    stores sars' transitions (items)
-    - erases old items once a given maxSize is reached (set to 0 for unlimited storage)
+    stores a uniform random sample (of at most maxSize items) of the entire stream of sars' transitions ever added (reservoir sampling)
+    - unlike the FIFO pruning of ReplayMemory, old experience stays represented in bounded memory no matter how long the stream gets
     """
 
     # initializes the storage
-    # max_size: when more than max_size items are in the storage block old new incoming ones
+    # max_size: the size of the reservoir
     def __init__(self, max_size: Union[int, None] = None):
+        super().__init__(max_size)
+        assert self.maxSize > 0, "ERROR in ReservoirReplayMemory: max_size must be larger than 0!"
+        self.numItemsSeen = 0  # the length of the stream so far
+
+    # adds items to the reservoir (algorithm R with the random draws done for all given items at once)
+    # - until the reservoir is full, items are simply appended
+    # - after that, the i-th item of the stream replaces a random stored item with probability maxSize/i
+    def add_items(self, items: List[tuple]):
+        num_appended = max(0, min(len(items), self.maxSize - len(self.items)))
+        self.items.extend(items[:num_appended])
+        rest = items[num_appended:]
+        if len(rest) > 0:
+            # the (1-based) stream positions of the remaining items and a uniform draw from [0, position) for each of them
+            positions = self.numItemsSeen + num_appended + np.arange(1, len(rest) + 1)
+            slots = (np.random.random(len(rest)) * positions).astype(np.int64)
+            for item_i in np.flatnonzero(slots < self.maxSize):
+                self.items[slots[item_i]] = rest[item_i]
+        self.numItemsSeen += len(items)
+
+
+class StratifiedReservoirReplayMemory(object):
+    """
+    stores the most recent sars' transitions (FIFO) plus a reservoir sample of all older ones
+    - items that drop out of the recent partition are fed into a ReservoirReplayMemory (the historical partition)
+    - samples are drawn from both partitions by a fixed ratio (if one partition does not have enough items, the other one fills in)
+    """
+
+    storesPythonObjects = True
+
+    # initializes the storage
+    # max_size: the max number of items in both partitions together
+    # recent_fraction: the share of max_size used for the recent partition, which is also the share of recent items in each sample
+    def __init__(self, max_size: Union[int, None] = None, recent_fraction: float=0.5):
+        if max_size is None:
+            max_size = 1000000
+        assert 0.0 < recent_fraction < 1.0, "ERROR in StratifiedReservoirReplayMemory: recent_fraction must be in (0, 1)!"
+        self.maxSize = max_size
+        self.recentFraction = recent_fraction
+        self.recentSize = max(1, int(max_size * recent_fraction))
+        self.recentItems = []  # used as a ring buffer once it has reached recentSize
+        self.nextRecentSlot = 0
+        self.historical = ReservoirReplayMemory(max(1, max_size - self.recentSize))
+
+    # adds items to the recent partition; items that are pushed out of it go into the historical partition
+    def add_items(self, items: List[tuple]):
+        evicted = []
+        for item in items:
+            if len(self.recentItems) < self.recentSize:
+                self.recentItems.append(item)
+            else:
+                evicted.append(self.recentItems[self.nextRecentSlot])
+                self.recentItems[self.nextRecentSlot] = item
+                self.nextRecentSlot = (self.nextRecentSlot + 1) % self.recentSize
+        self.historical.add_items(evicted)
+
+    # returns the indices of n randomly selected items
+    # - indices below recentSize are slots in the recent partition; the others are (recentSize + slot) in the historical partition
+    def get_random_indices(self, num_items: int) -> np.ndarray:
+        num_recent = min(int(round(num_items * self.recentFraction)), len(self.recentItems))
+        num_historical = min(num_items - num_recent, len(self.historical))
+        num_recent = min(num_items - num_historical, len(self.recentItems))
+        return np.concatenate([np.array(random.sample(range(len(self.recentItems)), num_recent), dtype=np.int64),
+                               self.recentSize + self.historical.get_random_indices(num_historical)])
+
+    # returns the items stored under the given indices (see get_random_indices)
+    def get_items(self, indices: np.ndarray) -> List[tuple]:
+        return [self.recentItems[i] if i < self.recentSize else self.historical.items[i - self.recentSize] for i in indices]
+
+    # returns n randomly selected items from both partitions
+    def get_random_items(self, num_items: int) -> List[tuple]:
+        return self.get_items(self.get_random_indices(num_items))
+
+    # returns n randomly selected items from both partitions as a SampleBatch of column arrays
+    def sample_batch(self, num_items: int) -> SampleBatch:
+        indices = self.get_random_indices(num_items)
+        return ReplayMemory.items_to_batch(self.get_items(indices), indices)
+
+    # returns the number of items in both partitions
+    def __len__(self):
+        return len(self.recentItems) + len(self.historical)
+
+
+class RingBufferReplayMemory(object):
+    """
+    stores sars' transitions (items) in preallocated, typed numpy columns (s, a, r and s')
+    - the columns are used as a ring buffer: once maxSize is reached, the oldest items are overwritten in place
+    - inserts cost O(number of added items) no matter how full the storage is; the memory footprint is fixed from the start
+    """
+
+    storesPythonObjects = False  # s and s' are stored as raw state values (must be World.dimState long)
+
+    # initializes the storage
+    # dim_state: the number of features in one state vector (see World.dimState)
+    # max_size: the number of item slots to preallocate; when more items come in, the oldest ones get overwritten
+    # state_dtype: the numpy dtype of the s and s' columns
+    def __init__(self, dim_state: int, max_size: Union[int, None] = None, state_dtype=np.float64):
         if max_size is None:
             max_size = 1000000
-        self.items = queue.PriorityQueue(maxsize=max_size)
+        assert max_size > 0, "ERROR in RingBufferReplayMemory: max_size must be larger than 0!"
+        self.dimState = dim_state
+        self.maxSize = max_size
+        self.stateDType = np.dtype(state_dtype)
+        self.states, self.actions, self.rewards, self.nextStates = self.allocate_columns()
+        self.nextIndex = 0  # the slot the next item will be written to
+        self.size = 0  # the number of valid items in the storage
+
+    # creates the (empty) s, a, r and s' columns
+    def allocate_columns(self) -> tuple:
+        return np.zeros((self.maxSize, self.dimState), dtype=self.stateDType), np.zeros(self.maxSize, dtype=np.int32), \
+            np.zeros(self.maxSize, dtype=np.float32), np.zeros((self.maxSize, self.dimState), dtype=self.stateDType)
+
+    # adds items to our storage
+    # - writes the items into the next free slots (wrapping around and overwriting the oldest items once we are full)
+    def add_items(self, items: List[tuple]):
+        # only the last maxSize items of a (huge) batch could survive this insert anyway
+        if len(items) > self.maxSize:
+            items = items[-self.maxSize:]
+        num_items = len(items)
+        if num_items == 0:
+            return
+        s, a, r, s_ = zip(*items)
+        slots = (self.nextIndex + np.arange(num_items)) % self.maxSize
+        self.states[slots] = s
+        self.actions[slots] = a
+        self.rewards[slots] = r
+        self.nextStates[slots] = s_
+        self.nextIndex = (self.nextIndex + num_items) % self.maxSize
+        self.size = min(self.size + num_items, self.maxSize)
+
+    # returns an index array of n randomly selected (valid) slots
+    # - indices are drawn with replacement, which is what keeps this O(n) regardless of the storage size
+    def get_random_indices(self, num_items: int) -> np.ndarray:
+        if self.size == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.random.randint(0, self.size, size=min(num_items, self.size))
+
+    # returns the items stored under the given slot indices as a list of sars' tuples (with s and s' as tuples, so they can be used as table keys)
+    def get_items(self, indices: np.ndarray) -> List[tuple]:
+        return list(zip(map(tuple, self.states[indices].tolist()), self.actions[indices].tolist(), self.rewards[indices].tolist(),
+                        map(tuple, self.nextStates[indices].tolist())))
+
+    # returns n randomly selected items from the storage
+    def get_random_items(self, num_items: int) -> List[tuple]:
+        return self.get_items(self.get_random_indices(num_items))
+
+    # returns the items stored under the given slot indices as a SampleBatch (each column is one fancy-indexing copy out of our columns)
+    def get_batch(self, indices: np.ndarray) -> SampleBatch:
+        return SampleBatch(self.states[indices], self.actions[indices], self.rewards[indices], self.nextStates[indices], indices)
+
+    # returns n randomly selected items from the storage as a SampleBatch of column arrays
+    def sample_batch(self, num_items: int) -> SampleBatch:
+        return self.get_batch(self.get_random_indices(num_items))
+
+    # returns the number of valid items in our storage
+    def __len__(self):
+        return self.size
+
+
+class MemoryMappedReplayMemory(RingBufferReplayMemory):
+    """
+    a RingBufferReplayMemory whose s, a, r and s' columns are memory-mapped .npy files in a directory
+    - new items are written straight into the mapped files; sampling only pages in the rows that were actually sampled
+    - the write position and fill level are kept in a small json header, so that reopening the directory (e.g. after a server restart)
+      picks up all stored items instantly
+    """
+
+    # the column files (under the storage's directory)
+    COLUMN_FILES = ["states.npy", "actions.npy", "rewards.npy", "next_states.npy"]
+    HEADER_FILE = "header.json"
+
+    # initializes the storage or reopens an existing one
+    # directory: the directory holding the column files (will be created if it doesn't exist yet)
+    # dim_state, max_size, state_dtype: see RingBufferReplayMemory (must match the stored ones when reopening an existing storage)
+    def __init__(self, directory: str, dim_state: int, max_size: Union[int, None] = None, state_dtype=np.float64):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(dim_state, max_size, state_dtype)
+
+        # reopen an existing storage
+        header_path = os.path.join(self.directory, self.HEADER_FILE)
+        if os.path.exists(header_path):
+            with open(header_path) as file:
+                header = json.load(file)
+            self.nextIndex = header["nextIndex"]
+            self.size = header["size"]
+
+    # opens the column files (creates them if they don't exist yet)
+    def allocate_columns(self) -> tuple:
+        shapes = [(self.maxSize, self.dimState), (self.maxSize,), (self.maxSize,), (self.maxSize, self.dimState)]
+        dtypes = [self.stateDType, np.dtype(np.int32), np.dtype(np.float32), self.stateDType]
+        columns = []
+        for file_name, shape, dtype in zip(self.COLUMN_FILES, shapes, dtypes):
+            path = os.path.join(self.directory, file_name)
+            if os.path.exists(path):
+                column = np.lib.format.open_memmap(path, mode="r+")
+                assert column.shape == shape and column.dtype == dtype, \
+                    "ERROR in MemoryMappedReplayMemory: {} has shape={} dtype={} (expected shape={} dtype={})!".\
+                    format(path, column.shape, column.dtype, shape, dtype)
+            else:
+                column = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+            columns.append(column)
+        return tuple(columns)
+
+    # adds items to the mapped columns and then updates the header
+    def add_items(self, items: List[tuple]):
+        super().add_items(items)
+        self.write_header()
+
+    # (atomically) writes the current write position and fill level to the header file
+    def write_header(self) -> None:
+        header_path = os.path.join(self.directory, self.HEADER_FILE)
+        with open(header_path + ".tmp", "w") as file:
+            json.dump({"nextIndex": self.nextIndex, "size": self.size}, file)
+        os.replace(header_path + ".tmp", header_path)
+
+    # forces all changes in the mapped columns to be written to disk
+    def flush(self) -> None:
+        for column in [self.states, self.actions, self.rewards, self.nextStates]:
+            column.flush()
+
+
+class SharedRingBufferReplayMemory(RingBufferReplayMemory):
+    """
+    a RingBufferReplayMemory whose s, a, r and s' columns live in shared memory (see SharedArray)
+    - the memory can be passed to worker processes, which can then sample from it without copying the stored items
+    - only the process that owns the memory should add items (the workers see the fill level that the memory had when they were started)
+    """
+
+    # allocates the s, a, r and s' columns in shared memory
+    def allocate_columns(self) -> tuple:
+        self.sharedColumns = [SharedArray((self.maxSize, self.dimState), self.stateDType), SharedArray((self.maxSize,), np.int32),
+                              SharedArray((self.maxSize,), np.float32), SharedArray((self.maxSize, self.dimState), self.stateDType)]
+        return tuple(column.get_array() for column in self.sharedColumns)
+
+    # only pickle the shared memory handles, not copies of the columns (e.g. when passed to a spawned worker process)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ["states", "actions", "rewards", "nextStates"]:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.states, self.actions, self.rewards, self.nextStates = (column.get_array() for column in self.sharedColumns)
+
+
+# a batch of fixed-length windows of consecutive transitions (arrays of shape [batch_size, num_steps, ...]) as sampled from a SequenceReplayMemory
+# - mask is False for padded steps (steps after the end of the window's episode or after the newest stored step); padded steps are all zeros
+# - initial_lstm_states are the LSTM states that were stored along with the first step of each window
+SequenceBatch = namedtuple("SequenceBatch", ["states", "actions", "rewards", "next_states", "mask", "initial_lstm_states", "indices"])
+
+
+class SequenceReplayMemory(RingBufferReplayMemory):
+    """
+    a RingBufferReplayMemory that also knows about episodes
+    - records an episode ID for each stored step and (optionally) the recurrent (LSTM) state the learner had when the step was taken
+    - samples fixed-length windows of consecutive steps (e.g. num_lstm_steps long) that never cross an episode boundary (the rest is padded)
+    - windows are gathered with one fancy-indexing copy per column (no per-step copies)
+    """
+
+    # initializes the storage
+    # dim_state, max_size, state_dtype: see RingBufferReplayMemory
+    # dim_lstm_state: the size of the (flattened) recurrent state stored with each step (0=don't store any recurrent states)
+    def __init__(self, dim_state: int, max_size: Union[int, None] = None, state_dtype=np.float64, dim_lstm_state: int=0):
+        super().__init__(dim_state, max_size, state_dtype)
+        self.dimLSTMState = dim_lstm_state
+        self.episodeIds = np.zeros(self.maxSize, dtype=np.int64)
+        self.lstmStates = np.zeros((self.maxSize, dim_lstm_state), dtype=np.float32)
+        self.currentEpisode = 0
+
+    # adds items (consecutive steps) to our storage
+    # new_episode: whether the first of the given items starts a new episode (otherwise, the items continue the current episode)
+    # lstm_states: optional array (len(items) x dim_lstm_state) with the recurrent state at each of the given steps
+    def add_items(self, items: List[tuple], new_episode: bool=False, lstm_states: Union[np.ndarray, None]=None):
+        if new_episode:
+            self.end_episode()
+        first_slot = self.nextIndex
+        num_items = min(len(items), self.maxSize)
+        super().add_items(items)
+        slots = (first_slot + np.arange(num_items)) % self.maxSize
+        self.episodeIds[slots] = self.currentEpisode
+        if lstm_states is not None:
+            self.lstmStates[slots] = np.asarray(lstm_states, dtype=np.float32)[len(items) - num_items:]
+
+    # closes the current episode (the next item added will start a new one)
+    def end_episode(self) -> None:
+        self.currentEpisode += 1
+
+    # samples n windows of num_steps consecutive steps each
+    # - the windows start at uniformly chosen steps and get padded (mask=False) where their episode (or our storage) ends
+    def sample_sequences(self, num_sequences: int, num_steps: int) -> SequenceBatch:
+        starts = np.random.randint(0, self.size, size=num_sequences) if self.size > 0 else np.zeros(0, dtype=np.int64)
+        # logical positions (0=oldest stored step) -> physical slots
+        logical = starts[:, np.newaxis] + np.arange(num_steps)[np.newaxis, :]
+        oldest_slot = (self.nextIndex - self.size) % self.maxSize
+        slots = (oldest_slot + logical) % self.maxSize
+        mask = (logical < self.size) & (self.episodeIds[slots] == self.episodeIds[slots[:, :1]])
+
+        def padded(column: np.ndarray) -> np.ndarray:
+            values = column[slots]
+            return np.where(mask.reshape(mask.shape + (1,) * (values.ndim - 2)), values, 0)
+
+        return SequenceBatch(padded(self.states), padded(self.actions), padded(self.rewards), padded(self.nextStates), mask,
+                             self.lstmStates[slots[:, 0]] if slots.size > 0 else np.zeros((0, self.dimLSTMState), dtype=np.float32), slots[:, 0])
+
+
+class ShardedReplayMemory(object):
+    """
+    a thread-safe replay memory made of several independent shards (replay memories), each one guarded by its own lock
+    - concurrent writers (e.g. several client connections) grab different (free) shards, so ingestion does not serialize on one global lock
+    - sampling splits the requested number of items across the shards (proportional to their sizes) in one vectorized step and then samples
+      each shard under its own lock
+    """
+
+    # num_shards: the number of shards (should be about the number of concurrent writers + 1 for the learner)
+    # max_size: the max number of items in all shards together
+    # shard_factory: creates one shard given its max size (default: ReplayMemory), e.g. lambda max_size: RingBufferReplayMemory(2, max_size)
+    def __init__(self, num_shards: int=8, max_size: Union[int, None]=None, shard_factory: Union[Callable[[int], object], None]=None):
+        if max_size is None:
+            max_size = 1000000
+        if shard_factory is None:
+            shard_factory = ReplayMemory
+        self.maxSize = max_size
+        self.shardSize = -(-max_size // num_shards)  # ceil
+        self.shards = [shard_factory(self.shardSize) for _ in range(num_shards)]
+        self.locks = [threading.Lock() for _ in range(num_shards)]
+        self.shardCounter = itertools.count()  # round-robin start shard for writers (next() on a count is atomic in CPython)
+
+    # our shards decide on how items are stored
+    @property
+    def storesPythonObjects(self) -> bool:
+        return self.shards[0].storesPythonObjects
+
+    # adds items to the first shard that is not locked by another thread (starting round-robin)
+    # - only if all shards are busy do we wait (for the start shard)
+    def add_items(self, items: List[tuple]):
+        start = next(self.shardCounter)
+        for i in range(len(self.shards)):
+            shard_i = (start + i) % len(self.shards)
+            if self.locks[shard_i].acquire(blocking=False):
+                try:
+                    self.shards[shard_i].add_items(items)
+                finally:
+                    self.locks[shard_i].release()
+                return
+        with self.locks[start % len(self.shards)]:
+            self.shards[start % len(self.shards)].add_items(items)
+
+    # returns the number of items to sample from each shard (proportional to the shards' current sizes)
+    # - no shard is asked for more items than it holds: what a shard can't deliver gets redrawn from the shards with items to spare
+    def get_shard_counts(self, num_items: int) -> np.ndarray:
+        sizes = np.array([len(shard) for shard in self.shards], dtype=np.int64)
+        num_items = min(num_items, int(sizes.sum()))
+        counts = np.zeros(len(self.shards), dtype=np.int64)
+        while counts.sum() < num_items:
+            spare = sizes - counts
+            counts = np.minimum(counts + np.random.multinomial(num_items - counts.sum(), spare / spare.sum()), sizes)
+        return counts
+
+    # returns n randomly selected items from all shards
+    def get_random_items(self, num_items: int) -> List[tuple]:
+        counts = self.get_shard_counts(num_items)
+        items = []
+        for shard_i in np.flatnonzero(counts):
+            with self.locks[shard_i]:
+                items.extend(self.shards[shard_i].get_random_items(int(counts[shard_i])))
+        return items
+
+    # returns n randomly selected items from all shards as one SampleBatch
+    # - the returned indices are global: shard index * shardSize + index within the shard
+    def sample_batch(self, num_items: int) -> SampleBatch:
+        counts = self.get_shard_counts(num_items)
+        batches = []
+        for shard_i in np.flatnonzero(counts):
+            with self.locks[shard_i]:
+                batch = self.shards[shard_i].sample_batch(int(counts[shard_i]))
+            batches.append(batch._replace(indices=np.asarray(batch.indices) + shard_i * self.shardSize))
+        if len(batches) == 0:
+            return self.shards[0].sample_batch(0)
+        return SampleBatch(*[np.concatenate(column) for column in zip(*batches)])
+
+    # returns the number of items in all shards
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+
+class PrefetchingSampler(object):
+    """
+    pulls batches from a replay memory in a background thread, so that the next batches are ready by the time the learner asks for them
+    - keeps up to num_prefetch batches in a queue
+    - numpy sampling (fancy-indexing) mostly runs without the GIL, so it overlaps with the learner's work on the current batch
+    """
+
+    # sample_function: returns one batch given the batch size (e.g. a replay memory's sample_batch or get_random_items)
+    # batch_size: the size of each batch
+    # num_prefetch: the max number of batches to prepare in advance
+    # max_num_batches: the number of batches to prepare in total (None=until stopped)
+    def __init__(self, sample_function: Callable[[int], object], batch_size: int, num_prefetch: int=4, max_num_batches: Union[int, None]=None):
+        self.sampleFunction = sample_function
+        self.batchSize = batch_size
+        self.maxNumBatches = max_num_batches
+        self.batches = queue.Queue(maxsize=num_prefetch)
+        self.stopEvent = threading.Event()
+        self.thread = threading.Thread(target=self.fill, daemon=True)
+        self.thread.start()
+
+    # the background thread's loop: keeps the queue filled until we are stopped or have prepared max_num_batches batches
+    def fill(self) -> None:
+        num_batches = 0
+        while not self.stopEvent.is_set() and (self.maxNumBatches is None or num_batches < self.maxNumBatches):
+            try:
+                batch = self.sampleFunction(self.batchSize)
+            # hand the error to the learner's thread (raised there in get_batch)
+            except Exception as e:
+                batch = e
+            while not self.stopEvent.is_set():
+                try:
+                    self.batches.put(batch, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if isinstance(batch, Exception):
+                return
+            num_batches += 1
+
+    # returns the next prepared batch (blocks until one is ready)
+    def get_batch(self) -> object:
+        batch = self.batches.get()
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
+
+    # stops the background thread
+    def stop(self) -> None:
+        self.stopEvent.set()
+        self.thread.join()
+
+
+class SumTree(object):
+    """
+    a binary segment tree over a fixed number of leaves (e.g. priorities) that keeps the sum, the min and the max of each subtree
+    - (batched) leaf updates cost O(log n)
+    - prefix-sum lookups (used for proportional sampling) are done for a whole batch of values at once
+    - empty (cleared) leaves count as 0 for the sums and are ignored by min and max
+    """
+
+    # capacity: the number of leaves
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.treeSize = 1  # the number of leaves rounded up to the next power of 2
+        while self.treeSize < capacity:
+            self.treeSize *= 2
+        # node i has the children 2i and 2i+1, the root is node 1 and the leaves live at [treeSize, 2*treeSize)
+        self.sums = np.zeros(2 * self.treeSize, dtype=np.float64)
+        self.mins = np.full(2 * self.treeSize, np.inf, dtype=np.float64)
+        self.maxs = np.full(2 * self.treeSize, -np.inf, dtype=np.float64)
+
+    # sets the given leaves (a single index or an array of indices) to the given value(s)
+    def update(self, indices, values) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        self.set_leaves(indices, values, values, values)
+
+    # empties the given leaves
+    def clear(self, indices) -> None:
+        self.set_leaves(indices, 0.0, np.inf, -np.inf)
+
+    # writes the leaves and then refreshes all their ancestors (level by level, each level in one vectorized step)
+    def set_leaves(self, indices, sums, mins, maxs) -> None:
+        nodes = np.atleast_1d(np.asarray(indices, dtype=np.int64)) + self.treeSize
+        if nodes.size == 0:
+            return
+        self.sums[nodes] = sums
+        self.mins[nodes] = mins
+        self.maxs[nodes] = maxs
+        # all nodes are on the same level, so we are done once we reach the root
+        while nodes[0] > 1:
+            nodes = np.unique(nodes // 2)
+            left = 2 * nodes
+            self.sums[nodes] = self.sums[left] + self.sums[left + 1]
+            self.mins[nodes] = np.minimum(self.mins[left], self.mins[left + 1])
+            self.maxs[nodes] = np.maximum(self.maxs[left], self.maxs[left + 1])
+
+    # returns the value(s) of the given leaves (0.0 for empty leaves)
+    def get(self, indices) -> np.ndarray:
+        return self.sums[np.asarray(indices, dtype=np.int64) + self.treeSize]
+
+    # returns the sum over all leaves
+    def total(self) -> float:
+        return float(self.sums[1])
+
+    # returns the smallest value of all non-empty leaves (inf if all leaves are empty)
+    def min(self) -> float:
+        return float(self.mins[1])
+
+    # returns the largest value of all non-empty leaves (-inf if all leaves are empty)
+    def max(self) -> float:
+        return float(self.maxs[1])
+
+    # returns the index of the leaf with the largest value
+    def argmax(self) -> int:
+        node = 1
+        while node < self.treeSize:
+            node = 2 * node if self.maxs[2 * node] >= self.maxs[2 * node + 1] else 2 * node + 1
+        return node - self.treeSize
+
+    # returns the index of the non-empty leaf with the smallest value
+    def argmin(self) -> int:
+        node = 1
+        while node < self.treeSize:
+            node = 2 * node if self.mins[2 * node] <= self.mins[2 * node + 1] else 2 * node + 1
+        return node - self.treeSize
+
+    # returns the indices of the (up to) n non-empty leaves with the largest values (largest first; equal values in the order of their indices)
+    # - a best-first walk down the max-tree: only visits the O(n log(capacity)) nodes on the paths to these leaves
+    def top_k(self, num_leaves: int) -> np.ndarray:
+        leaves = []
+        candidates = [(-self.maxs[1], 1)] if self.maxs[1] > -np.inf else []
+        while len(candidates) > 0 and len(leaves) < num_leaves:
+            _, node = heapq.heappop(candidates)
+            if node >= self.treeSize:
+                leaves.append(node - self.treeSize)
+                continue
+            for child in (2 * node, 2 * node + 1):
+                if self.maxs[child] > -np.inf:
+                    heapq.heappush(candidates, (-self.maxs[child], child))
+        return np.array(leaves, dtype=np.int64)
+
+    # returns the indices of those leaves, at which the running sum over all leaves (from the left) exceeds the given values
+    # - all values are walked down the tree together (one vectorized step per tree level)
+    def find_prefix_sum_indices(self, values) -> np.ndarray:
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes.size > 0 and nodes[0] < self.treeSize:
+            left = 2 * nodes
+            left_sums = self.sums[left]
+            # never walk into an empty right subtree (can happen with float rounding at the very end of the range)
+            go_right = (values >= left_sums) & (self.sums[left + 1] > 0.0)
+            values = np.where(go_right, values - left_sums, values)
+            nodes = np.where(go_right, left + 1, left)
+        return nodes - self.treeSize
+
+
+class PriorityReplayMemory(object):
+    """
+    stores sars' transitions (items) together with a priority for each item
+    - backed by a SumTree: inserting items and updating priorities costs O(log n)
+    - items can be popped by priority (highest first) or sampled in batches (proportional or rank-based) including importance-sampling weights
+    - never blocks: once maxSize is reached, each new item evicts the item with the lowest priority (O(log n) via the SumTree's min);
+      new items with a priority below all stored ones are dropped
+    - the storage grows (doubles) as needed, so memory is only allocated for the slots that are actually used (maxSize=0: unlimited)
+    """
+
+    storesPythonObjects = True
+    INITIAL_CAPACITY = 1024  # the number of slots allocated up front (see grow)
+
+    # initializes the storage
+    # max_size: the number of items that fit into the storage (0=unlimited)
+    # alpha: how much prioritization is used when sampling (must be > 0; 1=fully proportional to the priorities/inverse ranks)
+    # beta: the exponent of the importance-sampling weights returned by `sample` (1=fully compensate for the non-uniform sampling)
+    # sampling_mode: "proportional" (P(i) ~ p(i)^alpha) or "rank" (P(i) ~ (1/rank(i))^alpha)
+    def __init__(self, max_size: Union[int, None] = None, alpha: float=0.6, beta: float=0.4, sampling_mode: str="proportional"):
+        if max_size is None:
+            max_size = 1000000
+        assert max_size >= 0, "ERROR in PriorityReplayMemory: max_size must not be negative (0=unlimited)!"
+        assert alpha > 0.0, "ERROR in PriorityReplayMemory: alpha must be larger than 0!"
+        assert sampling_mode in ["proportional", "rank"], "ERROR in PriorityReplayMemory: unknown sampling_mode '{}'!".format(sampling_mode)
+        self.maxSize = max_size
+        self.alpha = alpha
+        self.beta = beta
+        self.samplingMode = sampling_mode
+
+        self.capacity = min(max_size, self.INITIAL_CAPACITY) if max_size > 0 else self.INITIAL_CAPACITY  # the number of allocated slots
+        self.tree = SumTree(self.capacity)  # holds p^alpha for each occupied slot
+        self.priorities = np.zeros(self.capacity, dtype=np.float64)  # the raw priorities
+        self.occupied = np.zeros(self.capacity, dtype=bool)
+        self.items = [None] * self.capacity  # the sars' tuples (without the priority)
+        self.numSlotsUsed = 0  # slots [0, numSlotsUsed) have been written to at least once
+        self.freeSlots = []  # slots below numSlotsUsed that have been freed again by popping their items
+        self.size = 0
+        self.maxPriority = 1.0  # the largest priority seen so far (can be used for new items whose priority is not known yet)
 
     # adds items to our sorted storage
     # - the first element of the tuple will have to be the score by which we measure priority:
     #   p=-(r + gamma maxa' Q(s'a') - Q(s,a)) (negative so that high rewards are processed first)
     def add_items(self, items: List[tuple]):
+        slots = []
+        priorities = []
         for item in items:
-            self.items.put(item)
+            slot = self.get_free_slot()
+            if slot is None:
+                # we are full: the tree has to know about the items added so far before we can pick the lowest priority one
+                self.update_priorities(slots, priorities)
+                slots, priorities = [], []
+                slot = self.get_eviction_slot(-item[0])
+                if slot is None:
+                    continue
+            self.items[slot] = tuple(item[1:])
+            slots.append(slot)
+            priorities.append(-item[0])
+        self.update_priorities(slots, priorities)
+
+    # returns a free slot for a new item (or None if we are full)
+    def get_free_slot(self) -> Union[int, None]:
+        if len(self.freeSlots) > 0:
+            slot = self.freeSlots.pop()
+        elif self.numSlotsUsed < self.maxSize or self.maxSize == 0:
+            if self.numSlotsUsed == self.capacity:
+                self.grow()
+            slot = self.numSlotsUsed
+            self.numSlotsUsed += 1
+        else:
+            return None
+        self.occupied[slot] = True
+        self.size += 1
+        return slot
+
+    # doubles the number of allocated slots (up to maxSize) and rebuilds the SumTree for the new capacity
+    def grow(self) -> None:
+        capacity = 2 * self.capacity if self.maxSize == 0 else min(2 * self.capacity, self.maxSize)
+        self.priorities = np.concatenate([self.priorities, np.zeros(capacity - self.capacity, dtype=np.float64)])
+        self.occupied = np.concatenate([self.occupied, np.zeros(capacity - self.capacity, dtype=bool)])
+        self.items.extend([None] * (capacity - self.capacity))
+        occupied = np.flatnonzero(self.occupied)
+        self.tree = SumTree(capacity)
+        self.tree.update(occupied, self.priorities[occupied] ** self.alpha)
+        self.capacity = capacity
+
+    # returns the slot of the lowest priority item, which a new item with the given (raw) priority may overwrite
+    # - returns None if the new item's priority is lower than that of all stored items (the new item should then be dropped)
+    def get_eviction_slot(self, priority: float) -> Union[int, None]:
+        slot = self.tree.argmin()
+        return slot if priority >= self.priorities[slot] else None
+
+    # sets the (raw) priorities of the items in the given slots
+    def update_priorities(self, indices, priorities) -> None:
+        indices = np.asarray(indices, dtype=np.int64)
+        priorities = np.asarray(priorities, dtype=np.float64)
+        self.priorities[indices] = priorities
+        self.tree.update(indices, priorities ** self.alpha)
+        if priorities.size > 0:
+            self.maxPriority = max(self.maxPriority, float(priorities.max()))
+
+    # removes the items in the given slot(s) from the storage
+    def remove(self, slots) -> None:
+        slots = np.atleast_1d(np.asarray(slots, dtype=np.int64))
+        self.tree.clear(slots)
+        for slot in slots.tolist():
+            self.items[slot] = None
+        self.occupied[slots] = False
+        self.freeSlots.extend(slots.tolist())
+        self.size -= len(slots)
 
     # can be used to iterate over the entire priority queue until it's empty
     def iterate(self) -> tuple:
-        while True:
-            try:
-                item = self.items.get(block=False)
-            # that's it: queue is empty -> stop iteration
-            except queue.Empty:
-                return
-            # keep iterating until queue is empty
-            yield item
+        while self.size > 0:
+            yield self.get_item()
 
-    # can be used to iterate over the entire priority queue until it's empty
+    # pops the item with the highest priority off the storage
+    # - returns the (-p, s, a, r, s') tuple or None if the storage is empty
     def get_item(self) -> Union[tuple, None]:
-        try:
-            return self.items.get(block=False)
-        # that's it: queue is empty -> stop iteration
-        except queue.Empty:
+        if self.size == 0:
             return None
+        slot = self.tree.argmax()
+        item = (-float(self.priorities[slot]),) + self.items[slot]
+        self.remove(slot)
+        return item
+
+    # pops the (up to) n items with the highest priorities off the storage (O(n log(maxSize)), independent of how many items are stored)
+    # - returns a list of (-p, s, a, r, s') tuples (highest priority first)
+    def pop_items(self, num_items: int) -> List[tuple]:
+        slots = self.tree.top_k(num_items)
+        items = [(-float(self.priorities[slot]),) + self.items[slot] for slot in slots.tolist()]
+        self.remove(slots)
+        return items
+
+    # samples n items (without removing them) according to our samplingMode
+    # - returns the list of sars' tuples, their slot indices (to be passed into `update_priorities` later) and their importance-sampling weights
+    #   (normalized so that the largest possible weight is 1.0)
+    def sample(self, num_items: int) -> tuple:
+        if self.size == 0 or num_items == 0:
+            return [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+        # stratified sampling: one uniform draw from each of num_items equally sized segments
+        bounds = (np.arange(num_items) + np.random.random(num_items)) / num_items
+        if self.samplingMode == "proportional":
+            total = self.tree.total()
+            indices = self.tree.find_prefix_sum_indices(bounds * total)
+            probs = self.tree.get(indices) / total
+            min_prob = self.tree.min() / total
+        else:
+            occupied = np.flatnonzero(self.occupied)
+            order = occupied[np.argsort(-self.priorities[occupied], kind="stable")]
+            rank_probs = (1.0 / np.arange(1, len(order) + 1)) ** self.alpha
+            rank_probs /= rank_probs.sum()
+            ranks = np.minimum(np.searchsorted(np.cumsum(rank_probs), bounds, side="right"), len(order) - 1)
+            indices = order[ranks]
+            probs = rank_probs[ranks]
+            min_prob = rank_probs[-1]
+
+        # w(i) = (N * P(i))^-beta / max(w)
+        weights = (min_prob / probs) ** self.beta
+        return [self.items[i] for i in indices], indices, weights
+
+    # returns n items sampled according to their priorities (without removing them)
+    def get_random_items(self, num_items: int) -> List[tuple]:
+        return self.sample(num_items)[0]
 
-    # returns the len of our storage list
+    # returns the number of items in our storage
     def __len__(self):
-        return self.items.qsize()
+        return self.size
+
+
+class IndexedPriorityReplayMemory(PriorityReplayMemory):
+    """
+    a PriorityReplayMemory that stores at most one item per (s, a) pair
+    - adding an item for a pair that is already stored updates that item in place (decrease-/increase-key) instead of adding a duplicate
+    - the stored priority of a pair is the maximum of its old and new priority (the transition itself is replaced by the newest one)
+    """
+
+    def __init__(self, max_size: Union[int, None] = None, alpha: float=0.6, beta: float=0.4, sampling_mode: str="proportional"):
+        super().__init__(max_size, alpha, beta, sampling_mode)
+        self.slotsByKey = {}  # key=(s, a); value=the slot holding the item for this pair
+
+    # adds (-p, s, a, r, s') items in bulk
+    # - items for (s, a) pairs that are already stored (or that appear several times in items) are merged, keeping the max priority
+    def add_items(self, items: List[tuple]):
+        priorities = {}  # key=slot; value=new raw priority
+        for item in items:
+            p = -item[0]
+            key = (item[1], item[2])
+            slot = self.slotsByKey.get(key)
+            if slot is None:
+                slot = self.get_free_slot()
+                if slot is None:
+                    # we are full: evict the lowest priority pair (the tree has to know about the priorities set so far)
+                    self.update_priorities(list(priorities.keys()), list(priorities.values()))
+                    priorities = {}
+                    slot = self.get_eviction_slot(p)
+                    if slot is None:
+                        continue
+                    del self.slotsByKey[self.items[slot][:2]]
+                self.slotsByKey[key] = slot
+            elif slot not in priorities:
+                p = max(p, self.priorities[slot])
+            self.items[slot] = tuple(item[1:])
+            priorities[slot] = max(p, priorities.get(slot, p))
+        self.update_priorities(list(priorities.keys()), list(priorities.values()))
+
+    # returns the slot holding the item for the given (s, a) pair (or None if we don't store this pair)
+    def get_slot(self, s, a: int) -> Union[int, None]:
+        return self.slotsByKey.get((s, a))
+
+    # removes the items in the given slot(s) from the storage
+    def remove(self, slots) -> None:
+        for slot in np.atleast_1d(slots).tolist():
+            del self.slotsByKey[self.items[slot][:2]]
+        super().remove(slots)
+
+
+class StateInterner(object):
+    """
+    a shared table that maps state tuples to compact integer IDs (and back)
+    - each distinct state tuple is stored exactly once, no matter how many transitions, q-table rows or model entries refer to it
+    - replay memories, QTables and TabularDeterministicWorldModels can then store (and hash) the IDs instead of the tuples
+    """
+
+    def __init__(self):
+        self.ids = {}  # key=state tuple; value=ID
+        self.states = []  # the state tuples by ID
+        self.lock = threading.Lock()  # only needed for assigning new IDs (lookups of known states are lock-free)
+
+    # returns the ID of the given state tuple (assigns a new ID to states we haven't seen yet)
+    # - thread-safe, so several writer threads can share one interner
+    def intern(self, s: tuple) -> int:
+        _id = self.ids.get(s)
+        if _id is None:
+            with self.lock:
+                # someone else may have added s while we were waiting for the lock
+                _id = self.ids.get(s)
+                if _id is None:
+                    _id = len(self.states)
+                    self.states.append(s)
+                    self.ids[s] = _id
+        return _id
+
+    # returns the state tuple for the given ID
+    def get_state(self, _id: int) -> tuple:
+        return self.states[_id]
+
+    # converts sars' items (with s and s' being tuples) into sars' items with s and s' being IDs
+    def intern_items(self, items: List[tuple]) -> List[tuple]:
+        return [(self.intern(s), a, r, self.intern(s_)) for s, a, r, s_ in items]
+
+    # returns the number of distinct states seen so far
+    def __len__(self):
+        return len(self.states)
 
 
 class World(object):
@@ -120,70 +933,341 @@ class World(object):
 class QTable(dict):
     """
     simplest Q-table implementation: dictionary
-    - keys are state tuples with #elem=World.stateDim
+    - keys are state tuples with #elem=World.stateDim (or their IDs, if the algorithm uses a StateInterner)
     - values are lists of action/q-value tuples
+    - the max q-value and the greedy action of each state are cached (and kept current by upsert_q_value), so get_max_a and
+      get_greedy_action are O(1)
+    - reads of unknown states return the default q-value (0.0) without adding a record: records are only created by real writes
+      (unless materialize_on_read is set)
+    - keeps track of the states that were written to since the last sync (see pop_changes)
     """
 
     # num_actions: the number of possible actions in each state
-    def __init__(self, num_actions: int):
+    # materialize_on_read: whether reads of unknown states should add a (zeroed) record for them (like writes do)
+    def __init__(self, num_actions: int, materialize_on_read: bool=False):
         super().__init__()
         self.numActions = num_actions
+        self.materializeOnRead = materialize_on_read
+        self.maxQs = {}  # key=state; value=(max q-value, greedy action)
+        self.dirtyStates = set()  # the states written to since the last call to pop_changes
+        self.version = 0  # incremented by each call to pop_changes
 
     # adds a new state record under s in this dict and sets all action dims to 0
     def add_state_record(self, s: tuple) -> None:
         assert (s not in self)
         self[s] = [0.0 for _ in range(self.numActions)]
+        self.maxQs[s] = (0.0, 0)
 
     # returns the q value for s and a
-    # - also fills in new values if entries cannot be found
+    # - only fills in new values for unknown states if materializeOnRead is set
     def get_q_value(self, s: tuple, a: int) -> float:
         assert a < self.numActions, "ERROR in get_q_value: no entry for action {:d} found".format(a)
         if s in self:
             return self[s][a]
-        else:
+        elif self.materializeOnRead:
             self.add_state_record(s)
-            return 0.0
+        return 0.0
 
     # returns the max(a) value (a Q-value, not an action) given s
+    # - only fills in new values for unknown states if materializeOnRead is set
     def get_max_a(self, s: tuple) -> float:
         if s in self:
-            l = self[s]
-            max_q = float("-inf")
-            for i, q in enumerate(l):
-                if q > max_q:
-                    max_q = q
-            return max_q
-        else:
+            return self.maxQs[s][0]
+        elif self.materializeOnRead:
             self.add_state_record(s)
-            # all are the same -> return a random action
-            return 0.0
+        # all are the same (0.0)
+        return 0.0
+
+    # returns the greedy action (argmax(a) Q(s,a)) for s
+    # - for unknown states (all q-values are the same), returns a random action
+    def get_greedy_action(self, s: tuple) -> int:
+        if s in self:
+            return self.maxQs[s][1]
+        return random.randrange(self.numActions)
 
     # updates an existing entry or creates a new entry given s,a and a q-value
     def upsert_q_value(self, s: tuple, a: int, q: float) -> None:
         if s in self:
             assert a < self.numActions, "ERROR in upsert_q_value: given action ({:d}) out of bounds".format(a)
-            self[s][a] = q  # override old value
+            l = self[s]
+            l[a] = q  # override old value
+            self.dirtyStates.add(s)
+            # keep the cached max current: only if the greedy action got worse do we have to rescan the action list
+            max_q, max_a = self.maxQs[s]
+            if a == max_a and q < max_q:
+                max_a = max(range(self.numActions), key=l.__getitem__)
+                self.maxQs[s] = (l[max_a], max_a)
+            elif a == max_a or q > max_q:
+                self.maxQs[s] = (q, a)
         else:
             self.add_state_record(s)
             self.upsert_q_value(s, a, q)
 
+    # removes all states (and their cached max values)
+    def clear(self) -> None:
+        super().clear()
+        self.maxQs.clear()
+        self.dirtyStates.clear()
+
+    # returns the new version number of this table and the (state, list of q-values) rows that changed since the last call
+    # (or all rows if full is set)
+    def pop_changes(self, full: bool=False) -> tuple:
+        if full:
+            rows = [(s, list(l)) for s, l in self.items()]
+        else:
+            rows = [(s, list(self[s])) for s in self.dirtyStates]
+        self.dirtyStates = set()
+        self.version += 1
+        return self.version, rows
+
+    # converts a batch of states (an n x World.dimState array, a 1D array of state IDs or a list of states) into a list of our keys
+    @staticmethod
+    def to_keys(states) -> list:
+        if isinstance(states, np.ndarray):
+            return list(map(tuple, states.tolist())) if states.ndim == 2 else states.tolist()
+        return list(states)
+
+    # batched version of get_q_value: returns an array with the q values for the given states and actions
+    def get_q_values(self, states, actions) -> np.ndarray:
+        return np.array([self.get_q_value(s, a) for s, a in zip(self.to_keys(states), np.asarray(actions).tolist())], dtype=np.float64)
+
+    # batched version of get_max_a: returns an array with the max(a) values for the given states
+    def get_max_as(self, states) -> np.ndarray:
+        return np.array([self.get_max_a(s) for s in self.to_keys(states)], dtype=np.float64)
+
+    # batched version of upsert_q_value
+    def upsert_q_values(self, states, actions, qs) -> None:
+        for s, a, q in zip(self.to_keys(states), np.asarray(actions).tolist(), np.asarray(qs).tolist()):
+            self.upsert_q_value(s, a, q)
+
+    # moves the q-values of the given (s, a) pairs towards the given targets: Q(s,a) += learning_rate * (target - Q(s,a))
+    # - learning_rates can be one value or one value per pair
+    # - duplicate (s, a) pairs are handled correctly (see combine_backups)
+    def backup_q_values(self, states, actions, targets, learning_rates) -> None:
+        keys = self.to_keys(states)
+        actions = np.asarray(actions).tolist()
+        pair_ids = {}
+        inverse = np.array([pair_ids.setdefault((s, a), len(pair_ids)) for s, a in zip(keys, actions)], dtype=np.int64)
+        unique_states = [s for s, _ in pair_ids]
+        unique_actions = [a for _, a in pair_ids]
+        q = self.get_q_values(unique_states, unique_actions)
+        self.upsert_q_values(unique_states, unique_actions, self.combine_backups(q, inverse, targets, learning_rates))
+
+    # returns the new q-values for a batch of backups (given by the targets and learning rates) of k distinct (s, a) pairs with the current
+    # q-values q (inverse maps each backup to its pair)
+    # - applying n backups with the same target one after the other leaves q' = target + prod(1 - lr_i) * (q - target), which is what we
+    #   return for each pair (with the lr-weighted mean of its targets, in case the targets of a pair differ)
+    # - the product is summed up in log space, with its sign counted separately (learning rates > 1 overshoot the target); a learning rate
+    #   of 1 keeps nothing of q (log(0) = -inf)
+    @staticmethod
+    def combine_backups(q: np.ndarray, inverse: np.ndarray, targets, learning_rates) -> np.ndarray:
+        targets = np.asarray(targets, dtype=np.float64)
+        learning_rates = np.broadcast_to(np.asarray(learning_rates, dtype=np.float64), targets.shape)
+        with np.errstate(divide="ignore"):
+            # log|1 - lr| (log1p is more precise for the usual small learning rates)
+            log_keeps = np.where(learning_rates < 1.0, np.log1p(-np.minimum(learning_rates, 1.0)), np.log(np.abs(1.0 - learning_rates)))
+        num_negative = np.bincount(inverse, weights=learning_rates > 1.0, minlength=len(q))
+        keep = np.exp(np.bincount(inverse, weights=log_keeps, minlength=len(q))) * np.where(num_negative % 2 == 1, -1.0, 1.0)
+        lr_sums = np.bincount(inverse, weights=learning_rates, minlength=len(q))
+        lr_weighted_targets = np.bincount(inverse, weights=learning_rates * targets, minlength=len(q))
+        mean_targets = np.where(lr_sums > 0.0, lr_weighted_targets / np.where(lr_sums > 0.0, lr_sums, 1.0), q)
+        return mean_targets + keep * (q - mean_targets)
+
+
+class DenseQTable(object):
+    """
+    a Q-table for bounded, discrete state spaces (e.g. the (x, y) grid of a maze) backed by one preallocated float array
+    - the array has the shape state_space_shape + (numActions,); states (integer tuples) are used directly as array indices, so lookups are
+      array indexing instead of hashing and the memory footprint is known up front
+    - offers the same interface as QTable (incl. the batched get_q_values, get_max_as and upsert_q_values, which are vectorized here)
+    - behaves like a dict of (visited) states -> list of q-values, where that's needed (e.g. syncing with the client)
+    """
+
+    # state_space_shape: the number of possible values for each state feature
+    # num_actions: the number of possible actions in each state
+    # state_space_low: the lowest possible value for each state feature (default: all 0)
+    def __init__(self, state_space_shape: tuple, num_actions: int, state_space_low: Union[tuple, None]=None):
+        self.stateSpaceShape = tuple(state_space_shape)
+        self.numActions = num_actions
+        self.stateSpaceLow = tuple(state_space_low) if state_space_low is not None else (0,) * len(self.stateSpaceShape)
+        # table: the q-values; visited: which states have been written to; dirty: which states have been written to since the last call
+        # to pop_changes
+        self.table, self.visited, self.dirty = self.allocate_arrays()
+        self.version = 0  # incremented by each call to pop_changes
+
+    # creates the (empty) q-value, visited and dirty arrays
+    def allocate_arrays(self) -> tuple:
+        return np.zeros(self.stateSpaceShape + (self.numActions,), dtype=np.float64), np.zeros(self.stateSpaceShape, dtype=bool), \
+            np.zeros(self.stateSpaceShape, dtype=bool)
+
+    # converts a state into its index tuple in our table
+    def index(self, s: tuple) -> tuple:
+        index = tuple(int(x) - low for x, low in zip(s, self.stateSpaceLow))
+        if len(index) != len(self.stateSpaceShape) or any(i < 0 or i >= dim for i, dim in zip(index, self.stateSpaceShape)):
+            raise IndexError("ERROR in DenseQTable: state {} is outside of the state space!".format(s))
+        return index
+
+    # converts a batch of states (an n x World.dimState array or a list of state tuples) into a tuple of index arrays (one per state feature)
+    def indices(self, states) -> tuple:
+        states = np.asarray(states).astype(np.int64)
+        if states.size == 0:
+            states = states.reshape(0, len(self.stateSpaceShape))
+        states = states - np.array(self.stateSpaceLow, dtype=np.int64)
+        if states.ndim != 2 or states.shape[1] != len(self.stateSpaceShape) or \
+                np.any(states < 0) or np.any(states >= np.array(self.stateSpaceShape)):
+            raise IndexError("ERROR in DenseQTable: some states are outside of the state space!")
+        return tuple(states.T)
+
+    # returns the q value for s and a
+    def get_q_value(self, s: tuple, a: int) -> float:
+        assert a < self.numActions, "ERROR in get_q_value: no entry for action {:d} found".format(a)
+        return float(self.table[self.index(s) + (a,)])
+
+    # returns the max(a) value (a Q-value, not an action) given s
+    def get_max_a(self, s: tuple) -> float:
+        return float(self.table[self.index(s)].max())
+
+    # returns the greedy action (argmax(a) Q(s,a)) for s (O(numActions), but vectorized)
+    # - for unvisited states (all q-values are the same), returns a random action
+    def get_greedy_action(self, s: tuple) -> int:
+        index = self.index(s)
+        if not self.visited[index]:
+            return random.randrange(self.numActions)
+        return int(self.table[index].argmax())
+
+    # sets the q-value for s and a
+    def upsert_q_value(self, s: tuple, a: int, q: float) -> None:
+        assert a < self.numActions, "ERROR in upsert_q_value: given action ({:d}) out of bounds".format(a)
+        index = self.index(s)
+        self.table[index + (a,)] = q
+        self.visited[index] = True
+        self.dirty[index] = True
+
+    # batched version of get_q_value: returns an array with the q values for the given states and actions
+    def get_q_values(self, states, actions) -> np.ndarray:
+        return self.table[self.indices(states) + (np.asarray(actions, dtype=np.int64),)]
+
+    # batched version of get_max_a: returns an array with the max(a) values for the given states
+    def get_max_as(self, states) -> np.ndarray:
+        return self.table[self.indices(states)].max(axis=-1)
+
+    # batched version of upsert_q_value (for duplicate (s, a) pairs, the last q value wins)
+    def upsert_q_values(self, states, actions, qs) -> None:
+        indices = self.indices(states)
+        self.table[indices + (np.asarray(actions, dtype=np.int64),)] = qs
+        self.visited[indices] = True
+        self.dirty[indices] = True
+
+    # moves the q-values of the given (s, a) pairs towards the given targets: Q(s,a) += learning_rate * (target - Q(s,a))
+    # - learning_rates can be one value or one value per pair
+    # - duplicate (s, a) pairs are handled correctly (see QTable.combine_backups)
+    def backup_q_values(self, states, actions, targets, learning_rates) -> None:
+        indices = self.indices(states)
+        flat_indices = np.ravel_multi_index(indices + (np.asarray(actions, dtype=np.int64),), self.table.shape)
+        unique, inverse = np.unique(flat_indices, return_inverse=True)
+        q_flat = self.table.reshape(-1)  # a view on our table
+        q_flat[unique] = QTable.combine_backups(q_flat[unique], inverse.reshape(-1), targets, learning_rates)
+        self.visited[indices] = True
+        self.dirty[indices] = True
+
+    # resets all q-values to 0
+    def clear(self) -> None:
+        self.table.fill(0.0)
+        self.visited.fill(False)
+        self.dirty.fill(False)
+
+    # iterates over all visited states (as tuples) and their list of q-values
+    def items(self):
+        return self.get_rows(np.nonzero(self.visited))
+
+    # iterates over the states (as tuples) at the given state-space indices (as returned by np.nonzero) and their list of q-values
+    def get_rows(self, indices: tuple):
+        for index in zip(*(i.tolist() for i in indices)):
+            yield tuple(i + low for i, low in zip(index, self.stateSpaceLow)), self.table[index].tolist()
+
+    # returns the new version number of this table and the (state, list of q-values) rows that changed since the last call
+    # (or all visited rows if full is set)
+    # - only the rows we send get unmarked (and they are read after that): other processes (e.g. Hogwild workers) may keep marking rows
+    #   while we are reading, and those have to go out with the next call
+    def pop_changes(self, full: bool=False) -> tuple:
+        changed = np.nonzero(self.dirty)
+        self.dirty[changed] = False
+        rows = list(self.get_rows(np.nonzero(self.visited) if full else changed))
+        self.version += 1
+        return self.version, rows
+
+    def __contains__(self, s: tuple) -> bool:
+        try:
+            return bool(self.visited[self.index(s)])
+        except IndexError:
+            return False
+
+    # returns the number of visited states
+    def __len__(self):
+        return int(self.visited.sum())
+
+
+class SharedDenseQTable(DenseQTable):
+    """
+    a DenseQTable whose arrays live in shared memory (see SharedArray)
+    - the table can be passed to worker processes, which then update the very same q-values (e.g. lock-free, see HogwildQLearner)
+    """
+
+    # allocates the q-value, visited and dirty arrays in shared memory
+    def allocate_arrays(self) -> tuple:
+        self.sharedArrays = [SharedArray(self.stateSpaceShape + (self.numActions,), np.float64), SharedArray(self.stateSpaceShape, bool),
+                             SharedArray(self.stateSpaceShape, bool)]
+        return tuple(shared_array.get_array() for shared_array in self.sharedArrays)
+
+    # only pickle the shared memory handles, not copies of the arrays (e.g. when passed to a spawned worker process)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ["table", "visited", "dirty"]:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.table, self.visited, self.dirty = (shared_array.get_array() for shared_array in self.sharedArrays)
+
 
 class TabularDeterministicWorldModel(dict):
     """
     simplest state transition AND reward model: dictionary
     - keys are s/a-tuples with shape=(World.stateDim, 1(action))
     - values are the r/s' as tuples with shape=[1(reward), World.stateDim]
+    - states may also be IDs (if the algorithm uses a StateInterner)
+    - keeps a reverse index s' -> {(s, a): r} so that the predecessors of a state can be looked up without scanning the whole model
+    - keeps a list of all (s, a) keys so that modeled transitions can be sampled in O(1) each
     """
 
     # num_actions: the number of possible actions in each state
     def __init__(self, num_actions: int):
         super().__init__()
         self.numActions = num_actions
+        self.predecessors = {}  # key=s'; value=dict with key=(s, a) and value=r of all transitions leading to s'
+        self.transitionKeys = []  # all (s, a) keys (in the order in which they were first added)
 
     # adds a new state/action record
-    # - since we are assuming a deterministic environment, simply overwrite old records
+    # - since we are assuming a deterministic environment, simply overwrite old records (and remove them from the reverse index)
     def update(self, s: tuple, a: int, r: float, s_: tuple) -> None:
-        self[(s, a)] = (r, s_)
+        key = (s, a)
+        old = super().get(key)
+        if old is not None and old[1] != s_:
+            old_predecessors = self.predecessors[old[1]]
+            del old_predecessors[key]
+            if len(old_predecessors) == 0:
+                del self.predecessors[old[1]]
+        elif old is None:
+            self.transitionKeys.append(key)
+        self[key] = (r, s_)
+        self.predecessors.setdefault(s_, {})[key] = r
+
+    # removes all records (and the reverse index)
+    def clear(self) -> None:
+        super().clear()
+        self.predecessors.clear()
+        self.transitionKeys.clear()
 
     # returns the r/s' tuple for a given s/a
     def get(self, s: tuple, a: int) -> tuple:
@@ -193,18 +1277,46 @@ class TabularDeterministicWorldModel(dict):
             return 0.0, s
         return self[key]
 
-    # returns the sar-tuple that would lead to the given state s'
+    # returns the sar-tuples that would lead to the given state s'
     def get_sar_leading_to_s_(self, s_: tuple) -> list:
-        ret = []
-        for key, value in self.items():
-            if value[1] == s_:
-                ret.append((key[0], key[1], value[0]))  # sar
-        return ret
+        return [(s, a, r) for (s, a), r in self.predecessors.get(s_, {}).items()]
+
+    # samples n modeled transitions uniformly (with replacement)
+    # - returns the list of states, the array of actions, the array of rewards and the list of next states
+    def sample_transitions(self, num_items: int) -> tuple:
+        keys = [self.transitionKeys[i] for i in np.random.randint(0, len(self.transitionKeys), size=num_items).tolist()]
+        values = [self[key] for key in keys]
+        actions = np.array([a for _, a in keys], dtype=np.int64)
+        rewards = np.array([r for r, _ in values], dtype=np.float64)
+        return [s for s, _ in keys], actions, rewards, [s_ for _, s_ in values]
+
+    # compiles the model into integer-indexed arrays (e.g. for vectorized planning)
+    # - returns the list of all states in the model (s and s'), a (num-states x num-actions) int array with the index of s' for each (s, a)
+    #   (-1 for transitions we don't know yet) and a (num-states x num-actions) array with the rewards (0.0 for unknown transitions)
+    def to_arrays(self) -> tuple:
+        state_indices = {}  # key=state; value=index into the returned arrays
+        for (s, _), (_, s_) in self.items():
+            state_indices.setdefault(s, len(state_indices))
+            state_indices.setdefault(s_, len(state_indices))
+        next_states = np.full((len(state_indices), self.numActions), -1, dtype=np.int64)
+        rewards = np.zeros((len(state_indices), self.numActions), dtype=np.float64)
+        if len(self) > 0:
+            indices = np.array([state_indices[s] for s, _ in self.keys()], dtype=np.int64)
+            actions = np.array([a for _, a in self.keys()], dtype=np.int64)
+            next_states[indices, actions] = [state_indices[s_] for _, s_ in self.values()]
+            rewards[indices, actions] = [r for r, _ in self.values()]
+        return list(state_indices), next_states, rewards
 
 
 class Algorithm(object, metaclass=ABCMeta):
     """
     a simple algorithm object handling the learning algos and the distribution of the same over different CPU/GPU units
+    - a run (e.g. in a worker thread) can be paused, resumed and cancelled from other threads: run implementations call `checkpoint`
+      between their updates
+    - algorithms implement `iterate`, a generator that yields after each batch of updates: `run` exhausts it in one go, `start` and `step`
+      execute it in time slices (e.g. interleaved with other algorithms and I/O on one thread)
+    - a paused `run` blocks (at its next checkpoint) until it gets resumed, a paused time-sliced run ends its current `step` instead (so that
+      the calling thread can do other work in the meantime)
     """
 
     # just set a name here
@@ -213,13 +1325,61 @@ class Algorithm(object, metaclass=ABCMeta):
         self.name = name  # the algo's name
         self.callback = callback  # the callback to call when certain things happen (progress, done learning, q-table sync, etc..)
         self.replayMemory = None  # will be used for planning/priority experience replay
+        self.numUpdates = 0  # the number of value updates (e.g. q-backups) done so far (over all runs)
+        self.notPausedEvent = threading.Event()  # cleared while we are paused
+        self.notPausedEvent.set()
+        self.cancelled = False  # makes the current run stop at its next checkpoint
+        self.currentRun = None  # the generator of the current time-sliced run (see `start` and `step`)
+
+    # pauses the current run at its next checkpoint
+    def pause(self) -> None:
+        self.notPausedEvent.clear()
+
+    # resumes a paused run
+    def resume(self) -> None:
+        self.notPausedEvent.set()
+
+    # stops the current run at its next checkpoint (also if it's paused)
+    def cancel(self) -> None:
+        self.cancelled = True
+        self.notPausedEvent.set()
+
+    # clears a previous pause or cancel (to be called before a new run)
+    def reset_run_control(self) -> None:
+        self.cancelled = False
+        self.notPausedEvent.set()
+
+    # to be called by `run` between its updates: blocks while we are paused (unless this is a time-sliced run) and returns False if the run
+    # should stop
+    def checkpoint(self) -> bool:
+        if self.currentRun is None:
+            self.notPausedEvent.wait()
+        return not self.cancelled
+
+    # runs this algorithm (to completion)
+    def run(self, options: dict={}) -> None:
+        for _ in self.iterate(options):
+            pass
 
-    # runs this algorithm
-    # TODO: multiprocessing implementation
+    # runs this algorithm step by step: yields after each batch of updates
     @abstractmethod
-    def run(self, options: dict={}) -> None:
+    def iterate(self, options: dict={}) -> Iterator[None]:
         pass
 
+    # starts a new time-sliced run (to be continued by calling `step`)
+    def start(self, options: dict={}) -> None:
+        self.currentRun = self.iterate(options)
+
+    # continues the current time-sliced run for (at least one step and about) the given number of seconds or until we get paused
+    # - returns False once the run is done
+    def step(self, time_budget: float) -> bool:
+        deadline = time.perf_counter() + time_budget
+        for _ in self.currentRun:
+            if time.perf_counter() >= deadline or not self.notPausedEvent.is_set():
+                return True
+        self.currentRun = None
+        return False
+
     # resets all data associated with this algo (but not the algo's current hyper-parameters)
     @abstractmethod
     def reset_parameters(self) -> None:
@@ -236,7 +1396,8 @@ class BasicQLearner(Algorithm, metaclass=ABCMeta):
     a simple (tabular) q-learning algorithm
     """
 
-    def __init__(self, name: str, callback: Callable[[dict], None], learning_rate: float=0.01, gamma: float=0.95, client_sync_frequency: int=50):
+    def __init__(self, name: str, callback: Callable[[dict], None], learning_rate: float=0.01, gamma: float=0.95, client_sync_frequency: int=50,
+                 full_sync_frequency: int=20):
         """
         Args:
             name (str): the name of the algorithm
@@ -244,6 +1405,7 @@ class BasicQLearner(Algorithm, metaclass=ABCMeta):
             learning_rate (float): the learning rate for Q backups
             gamma (float): discount factor
             client_sync_frequency (int): frequency with which updates are sent to the client
+            full_sync_frequency (int): every how many q-table syncs we send a full snapshot instead of only the changed rows (0=never)
         """
         super().__init__(name, callback)
 
@@ -251,19 +1413,65 @@ class BasicQLearner(Algorithm, metaclass=ABCMeta):
         self.learningRate = learning_rate
         self.gamma = gamma
         self.clientSyncFrequency = client_sync_frequency
+        self.fullSyncFrequency = full_sync_frequency
+        self.fullSyncRequested = False  # whether the next q-table sync has to be a full snapshot
 
         # setup our learning tools
         self.qFunction = None
+        self.stateInterner = None  # if set (a StateInterner): states are stored as IDs in our replay memory, q-table and model
 
     # clear out our q-table as our parameter deposit
     def reset_parameters(self) -> None:
         self.qFunction.clear()
+        self.request_full_sync()
+
+    # makes the next q-table sync a full snapshot (e.g. when a client (re)connects and has missed some of the deltas)
+    def request_full_sync(self) -> None:
+        self.fullSyncRequested = True
+
+    # maps s and s' of the given sars' items to their IDs (only if we use a stateInterner and the items are not interned yet)
+    def intern_items(self, items: List[tuple]) -> List[tuple]:
+        if self.stateInterner is None or len(items) == 0 or not isinstance(items[0][0], tuple):
+            return items
+        return self.stateInterner.intern_items(items)
+
+    # maps the states and next_states columns of the given SampleBatch to ID arrays (only if we use a stateInterner and the batch is not
+    # interned yet)
+    def intern_batch(self, batch: SampleBatch) -> SampleBatch:
+        if self.stateInterner is None or batch.states.ndim != 2:
+            return batch
+        return batch._replace(states=np.array([self.stateInterner.intern(s) for s in map(tuple, batch.states.tolist())], dtype=np.int64),
+                              next_states=np.array([self.stateInterner.intern(s) for s in map(tuple, batch.next_states.tolist())], dtype=np.int64))
+
+    # returns the q-table rows to be sent to the client as a (num-rows x dim-state) array of states and a (num-rows x num-actions) array
+    # of q-values, the q-table's new version and whether these rows are a full snapshot (on the first sync, every fullSyncFrequency-th
+    # sync and when requested) or only the rows that changed since the last sync
+    def get_client_q_table(self) -> tuple:
+        full = self.fullSyncRequested or (self.fullSyncFrequency > 0 and self.qFunction.version % self.fullSyncFrequency == 0)
+        self.fullSyncRequested = False
+        version, rows = self.qFunction.pop_changes(full)
+        if len(rows) == 0:
+            return np.zeros((0, 0), dtype=np.int32), np.zeros((0, self.qFunction.numActions), dtype=np.float32), version, full
+        states = [s for s, _ in rows]
+        # send the actual state tuples, not their IDs
+        if self.stateInterner is not None:
+            states = [self.stateInterner.get_state(s) for s in states]
+        states = np.array(states).reshape(len(rows), -1)
+        q_values = np.array([q for _, q in rows], dtype=np.float32)
+        return states, q_values, version, full
+
+    # sends a q-table sync (a delta or a full snapshot) to the client
+    def sync_q_table(self) -> None:
+        states, q_values, version, full = self.get_client_q_table()
+        self.callback({"event": "qTableSync", "algorithmName": self.name, "states": states, "qValues": q_values, "version": version, "full": full})
 
     # name of hyper parameters must match class attribute name
     def set_hyperparameters(self, **kwargs) -> None:
         for key, value in kwargs.items():
             # make sure we don't allow fields that are not hyper parameters
-            assert key in ["learningRate", "gamma", "maxNumBatches", "batchSize", "clientSyncFrequency"]
+            assert key in ["learningRate", "gamma", "maxNumBatches", "batchSize", "clientSyncFrequency", "fullSyncFrequency", "numPrefetchBatches",
+                           "batchedUpdates", "maxNumSweeps", "sweepBatchSize", "tolerance", "sweepMode", "blockSize", "numPlanningSteps",
+                           "planningBatchSize", "numWorkers"]
             setattr(self, key, value)
 
 
@@ -274,7 +1482,9 @@ class RandomSampleOneStepTabularQLearner(BasicQLearner):
 
     def __init__(self, name: str, callback: Callable[[dict], None],
                  learning_rate: float=0.01, gamma: float=0.95, max_num_batches: int=10000, batch_size: int=128,
-                 client_sync_frequency: int=50, max_size_replay: Union[int, None]=None
+                 client_sync_frequency: int=50, max_size_replay: Union[int, None]=None,
+                 replay_memory: Union[ReplayMemory, RingBufferReplayMemory, PriorityReplayMemory, None]=None, num_prefetch_batches: int=0,
+                 batched_updates: bool=False
                  ):
         """
         Args:
@@ -286,41 +1496,236 @@ class RandomSampleOneStepTabularQLearner(BasicQLearner):
             batch_size (int): the number of experience tuples to pull for each batch from the ReplayMemory
             client_sync_frequency (int): the number of batches to complete before we send out an update to the client
             max_size_replay (int): the maximum number or sars tuples in our replayMemory
+            replay_memory (Union[ReplayMemory,RingBufferReplayMemory,PriorityReplayMemory,None]): an optional replay memory object to use
+                instead of a default ReplayMemory(max_size_replay) (e.g. a RingBufferReplayMemory for long running servers, a
+                PriorityReplayMemory for prioritized experience replay or a (Stratified)ReservoirReplayMemory to keep a uniform sample of
+                the entire experience stream)
+            num_prefetch_batches (int): the number of batches to prepare in a background thread while we work on the current batch
+                (0=no prefetching; not used with a PriorityReplayMemory, whose priorities change after each batch)
+            batched_updates (bool): whether to pull each batch as column arrays and do all its backups in one (vectorized) q-table operation
+                instead of item by item (only used with a DenseQTable: a (dict) QTable does its batched operations item by item anyway, which
+                is slower than the plain per-item backups)
         """
         super().__init__(name, callback, learning_rate, gamma, client_sync_frequency)
 
         self.maxNumBatches = max_num_batches
         self.batchSize = batch_size
+        self.numPrefetchBatches = num_prefetch_batches
+        self.batchedUpdates = batched_updates
 
         # setup our own replay memory
-        self.replayMemory = ReplayMemory(max_size_replay)
+        self.replayMemory = replay_memory if replay_memory is not None else ReplayMemory(max_size_replay)
 
     def add_items_to_replay_memory(self, items: list) -> None:
+        # memories that store python objects keep the interned IDs (the numpy-column based ones store the raw state values anyway)
+        if self.replayMemory.storesPythonObjects:
+            items = self.intern_items(items)
+        # a priority memory needs a priority for each item: new items get the highest priority seen so far, so they are replayed soon
+        if isinstance(self.replayMemory, PriorityReplayMemory):
+            items = [tuple([-self.replayMemory.maxPriority] + list(item)) for item in items]
         self.replayMemory.add_items(items)
 
     # runs the tabular q-learner algo on the given world and experience-storage
-    def run(self, options: dict={}) -> None:
+    # - with a PriorityReplayMemory: backups are scaled by the importance-sampling weights and the new |TD-errors| become the items' priorities
+    def iterate(self, options: dict={}) -> Iterator[None]:
         assert self.qFunction is not None, "Cannot execute run on {} if qFunction is missing!".format(type(self).__name__)
-
+        prioritized = isinstance(self.replayMemory, PriorityReplayMemory)
+        sampler = None
+        if self.numPrefetchBatches > 0 and not prioritized:
+            sampler = PrefetchingSampler(self.pull_batch, self.batchSize, self.numPrefetchBatches, self.maxNumBatches)
+        try:
+            yield from self.run_batches(prioritized, sampler)
+        finally:
+            if sampler is not None:
+                sampler.stop()
+
+    # whether batches get backed up in one q-table operation (see batched_updates): only a DenseQTable gains from that
+    def uses_batched_updates(self) -> bool:
+        return self.batchedUpdates and isinstance(self.qFunction, DenseQTable)
+
+    # pulls one (interned) batch from our (uniform) replay memory: a list of sars' tuples or (with batched updates) a SampleBatch
+    def pull_batch(self, num_items: int) -> Union[List[tuple], SampleBatch]:
+        if self.uses_batched_updates():
+            return self.intern_batch(self.replayMemory.sample_batch(num_items))
+        return self.intern_items(self.replayMemory.get_random_items(num_items))
+
+    # backs up the given list of sars' tuples one by one (backups are scaled by the given importance-sampling weights, if any)
+    # - returns the TD-errors
+    def backup_items(self, batch: List[tuple], weights: Union[np.ndarray, None]=None) -> list:
+        td_errors = []
+        for i, (s, a, r, s_) in enumerate(batch):
+            q_sa = self.qFunction.get_q_value(s, a)
+            max_a_ = self.qFunction.get_max_a(s_)
+            td_error = r + self.gamma * max_a_ - q_sa
+            new_q_sa = q_sa + self.learningRate * (td_error if weights is None else weights[i] * td_error)
+            self.qFunction.upsert_q_value(s, a, new_q_sa)
+            td_errors.append(td_error)
+            # TODO: collect some stats: e.g. avg reward per step
+        return td_errors
+
+    # backs up an entire SampleBatch at once: all TD-targets are computed (from the Q-values before this batch) and written back in one
+    # q-table operation (duplicate (s, a) pairs in the batch are combined as if they had been applied one after the other)
+    # - returns the TD-errors
+    def backup_batch(self, batch: SampleBatch, weights: Union[np.ndarray, None]=None) -> np.ndarray:
+        if len(batch.actions) == 0:
+            return np.zeros(0, dtype=np.float64)
+        q_sa = self.qFunction.get_q_values(batch.states, batch.actions)
+        targets = batch.rewards + self.gamma * self.qFunction.get_max_as(batch.next_states)
+        self.qFunction.backup_q_values(batch.states, batch.actions, targets, self.learningRate if weights is None else self.learningRate * weights)
+        return targets - q_sa
+
+    # does the actual q-backups for maxNumBatches batches
+    def run_batches(self, prioritized: bool, sampler: Union[PrefetchingSampler, None]) -> Iterator[None]:
         for batch_i in range(self.maxNumBatches):
-            # pull a batch from our ReplayMemory
-            batch = self.replayMemory.get_random_items(self.batchSize)
-            for s, a, r, s_ in batch:
-                q_sa = self.qFunction.get_q_value(s, a)
-                max_a_ = self.qFunction.get_max_a(s_)
-                new_q_sa = q_sa + self.learningRate * (r + self.gamma * max_a_ - q_sa)
-                self.qFunction.upsert_q_value(s, a, new_q_sa)
-                # TODO: collect some stats: e.g. avg reward per step
+            if not self.checkpoint():
+                break
+            # pull a batch from our ReplayMemory (or from our background sampler)
+            if prioritized:
+                batch, indices, weights = self.replayMemory.sample(self.batchSize)
+                batch = self.intern_items(batch)
+                if self.uses_batched_updates():
+                    batch = ReplayMemory.items_to_batch(batch, indices)
+            elif sampler is not None:
+                batch, indices, weights = sampler.get_batch(), None, None
+            else:
+                batch, indices, weights = self.pull_batch(self.batchSize), None, None
+
+            if self.uses_batched_updates():
+                td_errors = self.backup_batch(batch, weights)
+            else:
+                td_errors = self.backup_items(batch, weights)
+            self.numUpdates += len(td_errors)
+            # add a tiny constant so that no item ever drops to a zero sampling probability
+            if prioritized:
+                self.replayMemory.update_priorities(indices, np.abs(td_errors) + 1e-6)
 
             # sync our table with client every n batches
             # send some progress report to client
             if batch_i % self.clientSyncFrequency == 0:
                 self.callback({"event": "progress", "algorithmName": self.name, "pct": int(100 * batch_i / self.maxNumBatches)})
-                # TODO: change our protocol b/c json cannot handle tuples as keys, so for now, we have to convert the dict into string-keyed
-                q_table_to_send = {}
-                for key, value in self.qFunction.items():
-                    q_table_to_send[str(key)] = value
-                self.callback({"event": "qTableSync", "algorithmName": self.name, "qTable": q_table_to_send})
+                self.sync_q_table()
+            yield
+
+
+class HogwildQLearner(RandomSampleOneStepTabularQLearner):
+    """
+    a parallel (tabular) q-learning algorithm in the style of Hogwild! (F. Niu, B. Recht, C. Re, S. Wright 2011)
+    - keeps its q-table (a SharedDenseQTable) and its replay memory (a SharedRingBufferReplayMemory) in shared memory
+    - each run starts num_workers processes, which all sample batches from the shared replay memory and apply their (batched) TD-backups
+      to the shared q-table without any locking (colliding updates of the same (s, a) pair may get lost, which the TD-updates tolerate)
+    - the process that owns the algorithm only adds the experience, watches the workers' progress and syncs the q-table with the client
+    """
+
+    # values of our shared control flag (tells the workers whether to go on, wait or stop)
+    RUNNING = 0
+    PAUSED = 1
+    STOPPED = 2
+
+    def __init__(self, name: str, callback: Callable[[dict], None],
+                 learning_rate: float=0.01, gamma: float=0.95, max_num_batches: int=10000, batch_size: int=128,
+                 client_sync_frequency: int=50, max_size_replay: Union[int, None]=None, num_workers: Union[int, None]=None,
+                 dim_state: int=2, state_dtype=np.int32, start_method: Union[str, None]=None
+                 ):
+        """
+        Args:
+            name (str): the name of the algorithm
+            callback (Callable[dict, None]): a callback to call when we make progress, are done, etc..
+            learning_rate (float): the learning rate for Q backups
+            gamma (float): discount factor
+            max_num_batches (int): the number of batches to pull from the ReplayMemory per run (split evenly among the workers)
+            batch_size (int): the number of experience tuples to pull for each batch from the ReplayMemory
+            client_sync_frequency (int): the number of batches (of all workers together) to complete before we send out an update to the client
+            max_size_replay (int): the maximum number or sars tuples in our (shared) replayMemory
+            num_workers (int): the number of worker processes (default: the number of CPUs)
+            dim_state (int): the number of state features (for the replayMemory's state columns)
+            state_dtype: the dtype of the stored state features
+            start_method (str): the multiprocessing start method for the workers ("fork", "spawn" or "forkserver"; None=the platform's default)
+        """
+        super().__init__(name, callback, learning_rate, gamma, max_num_batches, batch_size, client_sync_frequency,
+                         replay_memory=SharedRingBufferReplayMemory(dim_state, max_size_replay, state_dtype), batched_updates=True)
+
+        self.numWorkers = num_workers if num_workers is not None else (os.cpu_count() or 1)
+        self.startMethod = start_method
+        self.workerControl = None  # the shared control flag of the current run's workers (None while we are not running)
+
+    # pause, resume and cancel are passed on to the workers right away (a paused time-sliced run doesn't get to its next step until resumed)
+    def pause(self) -> None:
+        super().pause()
+        self.set_worker_control()
+
+    def resume(self) -> None:
+        super().resume()
+        self.set_worker_control()
+
+    def cancel(self) -> None:
+        super().cancel()
+        self.set_worker_control()
+
+    # tells the workers (if any) whether to go on, wait or stop
+    def set_worker_control(self) -> None:
+        if self.workerControl is not None:
+            self.workerControl.get_array()[0] = HogwildQLearner.STOPPED if self.cancelled else \
+                HogwildQLearner.RUNNING if self.notPausedEvent.is_set() else HogwildQLearner.PAUSED
+
+    # runs the workers on our shared q-table and replay memory and waits for them to finish (or to be cancelled)
+    # - a pause is passed on to the workers, which then wait at their next batch
+    def iterate(self, options: dict={}) -> Iterator[None]:
+        assert isinstance(self.qFunction, SharedDenseQTable), \
+            "ERROR in HogwildQLearner: qFunction must be a SharedDenseQTable (is {})!".format(type(self.qFunction).__name__)
+        control = self.workerControl = SharedArray((1,), np.int64)
+        self.set_worker_control()
+        progress = SharedArray((self.numWorkers,), np.int64)  # the number of batches done by each worker
+        num_batches = -(-self.maxNumBatches // self.numWorkers)
+        context = multiprocessing.get_context(self.startMethod)
+        start_num_updates = self.numUpdates
+        workers = [context.Process(target=HogwildQLearner.run_worker, daemon=True,
+                                   args=(self.qFunction, self.replayMemory, num_batches, self.batchSize, self.learningRate, self.gamma,
+                                         np.random.randint(2 ** 31), control, progress, worker_i))
+                   for worker_i in range(self.numWorkers)]
+        for worker in workers:
+            worker.start()
+        try:
+            last_sync = 0
+            alive = workers
+            while len(alive) > 0:
+                alive[0].join(0.01)
+                alive = [worker for worker in alive if worker.is_alive()]
+                batches_done = int(progress.get_array().sum())
+                self.numUpdates = start_num_updates + batches_done * self.batchSize
+                # sync our table with client every n batches
+                # send some progress report to client
+                if batches_done - last_sync >= self.clientSyncFrequency:
+                    last_sync = batches_done
+                    self.callback({"event": "progress", "algorithmName": self.name,
+                                   "pct": int(100 * batches_done / (num_batches * self.numWorkers))})
+                    self.sync_q_table()
+                yield
+        finally:
+            self.workerControl = None
+            control.get_array()[0] = HogwildQLearner.STOPPED
+            for worker in workers:
+                worker.join()
+        failed = [worker.exitcode for worker in workers if worker.exitcode != 0]
+        assert len(failed) == 0, "ERROR in HogwildQLearner: {} worker(s) failed (exit codes: {})!".format(len(failed), failed)
+        self.sync_q_table()
+
+    # the work loop of one worker process: pulls num_batches batches from the shared replay memory and backs them up into the shared
+    # q-table (lock-free)
+    @staticmethod
+    def run_worker(q_table: SharedDenseQTable, replay_memory: SharedRingBufferReplayMemory, num_batches: int, batch_size: int,
+                   learning_rate: float, gamma: float, seed: int, control: SharedArray, progress: SharedArray, worker_i: int) -> None:
+        np.random.seed(seed + worker_i)
+        control, progress = control.get_array(), progress.get_array()
+        for _ in range(num_batches):
+            while control[0] == HogwildQLearner.PAUSED:
+                time.sleep(0.01)
+            if control[0] == HogwildQLearner.STOPPED:
+                break
+            batch = replay_memory.sample_batch(batch_size)
+            if len(batch.actions) > 0:
+                targets = batch.rewards + gamma * q_table.get_max_as(batch.next_states)
+                q_table.backup_q_values(batch.states, batch.actions, targets, learning_rate)
+            progress[worker_i] += 1
 
 
 class PrioritizedSweepingQLearner(BasicQLearner):
@@ -330,7 +1735,7 @@ class PrioritizedSweepingQLearner(BasicQLearner):
 
     def __init__(self, name: str, callback: Callable[[dict], None],
                  learning_rate: float=0.1, gamma: float=0.95, max_num_sweeps: int=1000, client_sync_frequency: int=100,
-                 max_size_replay: Union[int, None]=None, priority_threshold: float=0.1
+                 max_size_replay: Union[int, None]=None, priority_threshold: float=0.1, sweep_batch_size: int=1
                  ):
         """
         Args:
@@ -342,34 +1747,49 @@ class PrioritizedSweepingQLearner(BasicQLearner):
             client_sync_frequency (int): the number of sweeps to complete before we send out an update to the client
             max_size_replay (int): the maximum size of the replayMemory that we use
             priority_threshold (float): the minimum priority value that a sars tuple must have in order for it to be stored in our replayMemory
+            sweep_batch_size (int): how many of the top priority items to pop and back up together in each sweep step (1=classic prioritized
+                sweeping; larger values are less precise with regards to the order of the backups, but much faster)
         """
         super().__init__(name, callback, learning_rate, gamma, client_sync_frequency)
 
         self.maxNumSweeps = max_num_sweeps
         self.priorityThreshold = priority_threshold
+        self.sweepBatchSize = sweep_batch_size
 
-        # setup priority memory
-        self.replayMemory = PriorityReplayMemory(max_size_replay)
+        # setup priority memory (one entry per (s, a) pair)
+        self.replayMemory = IndexedPriorityReplayMemory(max_size_replay)
 
         # this algo needs a model to work "offline"
         self.model = None
 
     # same as parent BUT: calculates the priority of each sars tuple first based on the impact on learning the table
     def add_items_to_replay_memory(self, items: list) -> None:
-        # calc priority of the given items
-        for item in items:
-            # the higher p, the more interesting this tuple is
-            p = abs(item[2] + self.gamma * self.qFunction.get_max_a(item[3]) - self.qFunction.get_q_value(item[0], item[1]))
-            if p >= self.priorityThreshold:
-                # do negative p as python's riorityQueue takes the lowest scores first
-                item_to_add = tuple([-p] + list(item))
-                self.replayMemory.add_items([item_to_add])
+        if len(items) == 0:
+            return
+        # calc priority of the given items (all in one go)
+        # - the higher p, the more interesting this tuple is
+        states, actions, rewards, next_states = zip(*items)
+        ps = np.abs(np.array(rewards, dtype=np.float64) + self.gamma * self.qFunction.get_max_as(next_states) -
+                    self.qFunction.get_q_values(states, actions))
+        # do negative p as the PriorityReplayMemory (like python's PriorityQueue) takes the lowest scores first
+        # - insert all items at once (pairs that are already queued only get their priority raised)
+        self.replayMemory.add_items([(-p,) + tuple(item) for p, item in zip(ps.tolist(), items) if p >= self.priorityThreshold])
+
+    # backs up a batch of (-p, s, a, r, s') items popped off our replayMemory and queues all their predecessors (according to our model)
+    def sweep_items(self, items: List[tuple]) -> None:
+        _, states, actions, rewards, next_states = zip(*items)
+        targets = np.array(rewards, dtype=np.float64) + self.gamma * self.qFunction.get_max_as(next_states)
+        self.qFunction.backup_q_values(states, actions, targets, self.learningRate)
+
+        # get all s-1/a-1 (t-1) predicted (by our model) to end up in any of the s
+        predecessors = [(s_pre, a_pre, r_pre, s) for s in dict.fromkeys(states) for s_pre, a_pre, r_pre in self.model.get_sar_leading_to_s_(s)]
+        self.add_items_to_replay_memory(predecessors)
 
     # runs the prioritized sweeping algo
-    def run(self, options: dict={}) -> None:
+    def iterate(self, options: dict={}) -> Iterator[None]:
 
         # updates our model and inserts 'interesting' experiences (those with string learning changes) into the buffer (prioritized)
-        experiences = options["experiences"] if "experiences" in options else []
+        experiences = self.intern_items(options["experiences"] if "experiences" in options else [])
         for s, a, r, s_ in experiences:
             # only update our world model
             self.model.update(s, a, r, s_)
@@ -377,35 +1797,175 @@ class PrioritizedSweepingQLearner(BasicQLearner):
 
         # do the prioritized sweeping part
         sweeps = 0
-        while len(self.replayMemory) > 0 and sweeps < self.maxNumSweeps:
-            # pull top item
-            p, s, a, r, s_ = self.replayMemory.get_item()
-            sweeps += 1
-            q_sa = self.qFunction.get_q_value(s, a)
-            max_a_ = self.qFunction.get_max_a(s_)
-            new_q_sa = q_sa + self.learningRate * (r + self.gamma * max_a_ - q_sa)
-            self.qFunction.upsert_q_value(s, a, new_q_sa)
-
-            # get all s-1/a-1 (t-1) predicted (by our model) to end up in s
-            predecessors = self.model.get_sar_leading_to_s_(s)
-            for s_pre, a_pre, r_pre in predecessors:
-                self.add_items_to_replay_memory([(s_pre, a_pre, r_pre, s)])
+        while len(self.replayMemory) > 0 and sweeps < self.maxNumSweeps and self.checkpoint():
+            # pull top item(s)
+            items = self.replayMemory.pop_items(min(self.sweepBatchSize, self.maxNumSweeps - sweeps))
+            sweeps += len(items)
+            self.sweep_items(items)
+            self.numUpdates += len(items)
 
             # sync our table with client every n batches
             # send some progress report to client
-            if sweeps % self.clientSyncFrequency == 0:
+            if sweeps // self.clientSyncFrequency > (sweeps - len(items)) // self.clientSyncFrequency:
                 # report approximate progress (not more than 99%)
                 # - we don't know exact progress as we cannot estimate the items that get pushed into the queue each iteration
                 self.callback({"event": "progress", "algorithmName": self.name, "pct": min(int(100 * sweeps / self.maxNumSweeps), 99.0)})
+            yield
 
         # only when we are all done do we send a table refresh
-        q_table_to_send = {}
-        for key, value in self.qFunction.items():
-            q_table_to_send[str(key)] = value
-        self.callback({"event": "qTableSync", "algorithmName": self.name, "qTable": q_table_to_send})
+        self.sync_q_table()
         self.callback({"event": "progress", "algorithmName": self.name, "pct": 100})
 
 
+class ValueIterationQLearner(BasicQLearner):
+    """
+    a planner that solves the learned (deterministic) world model by value iteration (R. Sutton, A. Barto - RL, an Introduction 2016)
+    - compiles the TabularDeterministicWorldModel into integer-indexed transition and reward arrays and backs up all states at once
+    - only the actions that we have a model for count towards a state's value; states without any known transitions keep their current value
+    - sweep modes: "synchronous" (all states are updated from the values of the previous sweep) or "gauss-seidel" (the states are updated
+      block by block, each block already using the new values of the blocks before it)
+    """
+
+    def __init__(self, name: str, callback: Callable[[dict], None],
+                 gamma: float=0.95, max_num_sweeps: int=1000, tolerance: float=1e-6, sweep_mode: str="synchronous", block_size: int=64,
+                 client_sync_frequency: int=100
+                 ):
+        """
+        Args:
+            name (str): the name of the algorithm
+            callback (Callable[dict, None]): a callback to call when we make progress, are done, etc..
+            gamma (float): discount factor
+            max_num_sweeps (int): the maximum number of sweeps over the state space per run
+            tolerance (float): we are converged once no state value changes by more than this in one sweep
+            sweep_mode (str): "synchronous" or "gauss-seidel"
+            block_size (int): the number of states that are updated together in one gauss-seidel step
+            client_sync_frequency (int): the number of sweeps to complete before we send out a progress report to the client
+        """
+        # value iteration does full backups (learning rate 1.0)
+        super().__init__(name, callback, 1.0, gamma, client_sync_frequency)
+        assert sweep_mode in ["synchronous", "gauss-seidel"], "ERROR in ValueIterationQLearner: unknown sweep_mode '{}'!".format(sweep_mode)
+
+        self.maxNumSweeps = max_num_sweeps
+        self.tolerance = tolerance
+        self.sweepMode = sweep_mode
+        self.blockSize = block_size
+
+        # this algo needs a model to plan with
+        self.model = None
+
+    # updates our model with the given experiences, then solves the model and writes the resulting q-values into our qFunction
+    def iterate(self, options: dict={}) -> Iterator[None]:
+        experiences = self.intern_items(options["experiences"] if "experiences" in options else [])
+        for s, a, r, s_ in experiences:
+            self.model.update(s, a, r, s_)
+
+        states, next_states, rewards = self.model.to_arrays()
+        if len(states) > 0:
+            known = next_states >= 0
+            next_states = np.where(known, next_states, 0)  # unknown transitions are masked out anyway
+            values = self.qFunction.get_max_as(states)
+
+            for sweep in range(1, self.maxNumSweeps + 1):
+                if not self.checkpoint():
+                    break
+                if self.sweepMode == "synchronous":
+                    new_values = self.backup_values(values, next_states, rewards, known, values)
+                    delta = float(np.abs(new_values - values).max())
+                    values = new_values
+                else:
+                    delta = 0.0
+                    for start in range(0, len(states), self.blockSize):
+                        block = slice(start, start + self.blockSize)
+                        new_values = self.backup_values(values, next_states[block], rewards[block], known[block], values[block])
+                        delta = max(delta, float(np.abs(new_values - values[block]).max()))
+                        values[block] = new_values
+                self.numUpdates += len(states)
+
+                if sweep % self.clientSyncFrequency == 0:
+                    self.callback({"event": "progress", "algorithmName": self.name, "pct": min(int(100 * sweep / self.maxNumSweeps), 99.0)})
+                if delta < self.tolerance:
+                    break
+                yield
+
+            # write the q-values of all (s, a) pairs that we know
+            indices, actions = np.nonzero(known)
+            qs = rewards[indices, actions] + self.gamma * values[next_states[indices, actions]]
+            self.qFunction.upsert_q_values([states[i] for i in indices.tolist()], actions, qs)
+
+        self.sync_q_table()
+        self.callback({"event": "progress", "algorithmName": self.name, "pct": 100})
+
+    # returns the new values V(s) = max(a) [r(s,a) + gamma V(s'(s,a))] (over the known actions) for a set of states given by their rows
+    # in the model arrays
+    # - rows without any known action keep their old values
+    def backup_values(self, values: np.ndarray, next_states: np.ndarray, rewards: np.ndarray, known: np.ndarray,
+                      old_values: np.ndarray) -> np.ndarray:
+        qs = np.where(known, rewards + self.gamma * values[next_states], -np.inf)
+        return np.where(known.any(axis=1), qs.max(axis=1), old_values)
+
+
+class DynaQLearner(BasicQLearner):
+    """
+    a Dyna-Q learner (R. Sutton, A. Barto - RL, an Introduction 2016)
+    - learns directly from each batch of uploaded experiences and adds them to its (deterministic) world model
+    - then does n planning steps: backups of (s, a) pairs sampled from the model (processed in batches of planningBatchSize)
+    """
+
+    def __init__(self, name: str, callback: Callable[[dict], None],
+                 learning_rate: float=0.1, gamma: float=0.95, num_planning_steps: int=1000, planning_batch_size: int=128,
+                 client_sync_frequency: int=10
+                 ):
+        """
+        Args:
+            name (str): the name of the algorithm
+            callback (Callable[dict, None]): a callback to call when we make progress, are done, etc..
+            learning_rate (float): the learning rate for Q backups
+            gamma (float): discount factor
+            num_planning_steps (int): the number of modeled (s, a) pairs to back up after each batch of experience (can be overridden per run
+                via options["numPlanningSteps"])
+            planning_batch_size (int): the number of modeled (s, a) pairs to sample and back up together
+            client_sync_frequency (int): the number of planning batches to complete before we send out a progress report to the client
+        """
+        super().__init__(name, callback, learning_rate, gamma, client_sync_frequency)
+
+        self.numPlanningSteps = num_planning_steps
+        self.planningBatchSize = planning_batch_size
+
+        # this algo needs a model to plan with
+        self.model = None
+
+    # learns from the given experiences, adds them to our model and then plans (backs up pairs sampled from our model)
+    def iterate(self, options: dict={}) -> Iterator[None]:
+        experiences = self.intern_items(options["experiences"] if "experiences" in options else [])
+        for s, a, r, s_ in experiences:
+            self.model.update(s, a, r, s_)
+        # direct RL from the real experiences
+        if len(experiences) > 0:
+            states, actions, rewards, next_states = zip(*experiences)
+            self.backup(states, actions, np.array(rewards, dtype=np.float64), next_states)
+
+        # planning
+        num_planning_steps = options.get("numPlanningSteps", self.numPlanningSteps)
+        num_batches = -(-num_planning_steps // self.planningBatchSize) if len(self.model) > 0 else 0
+        for batch in range(num_batches):
+            if not self.checkpoint():
+                break
+            num_items = min(self.planningBatchSize, num_planning_steps - batch * self.planningBatchSize)
+            self.backup(*self.model.sample_transitions(num_items))
+            if (batch + 1) % self.clientSyncFrequency == 0:
+                self.callback({"event": "progress", "algorithmName": self.name, "pct": min(int(100 * (batch + 1) / num_batches), 99.0)})
+            yield
+
+        self.sync_q_table()
+        self.callback({"event": "progress", "algorithmName": self.name, "pct": 100})
+
+    # does one-step q-learning backups for a batch of transitions
+    def backup(self, states, actions, rewards: np.ndarray, next_states) -> None:
+        targets = rewards + self.gamma * self.qFunction.get_max_as(next_states)
+        self.qFunction.backup_q_values(states, actions, targets, self.learningRate)
+        self.numUpdates += len(targets)
+
+
 class LSTMGameObjectQLearner(BasicQLearner):
     """
     A neural network Q-learner that's based on:
@@ -420,7 +1980,7 @@ class LSTMGameObjectQLearner(BasicQLearner):
                  num_inputs: int=10,
                  num_lstm_steps: int=50, lstm_size: int=512, num_lstm_layers: int=1,
                  num_outputs: int=200,
-                 client_sync_frequency: int=50, max_size_replay: Union[int, None]=None
+                 client_sync_frequency: int=50, max_size_replay: int=100000, store_lstm_states: bool=False
                  ):
         """
         Args:
@@ -435,17 +1995,33 @@ class LSTMGameObjectQLearner(BasicQLearner):
             num_lstm_layers (int): the height of the LSTM-cell-stack
             num_outputs (int): the number of output nodes coming from the final layer
             client_sync_frequency (int): the number of batches to complete before we send out an update to the client
-            max_size_replay (int): the maximum number or sars tuples in our replayMemory
+            max_size_replay (int): the maximum number or sars tuples in our replayMemory (allocated up front; default: 100000, was 1M)
+            store_lstm_states (bool): whether to store the LSTM's (C, h) for each layer along with each step (costs 2 x lstm_size x
+                num_lstm_layers float32s per slot of the replayMemory)
         """
         super().__init__(name, callback, learning_rate, gamma, client_sync_frequency)
 
         self.max_num_batches = max_num_batches
         self.batch_size = batch_size
+        self.num_lstm_steps = num_lstm_steps
         self.max_size_replay = max_size_replay
 
+        # an episode-aware memory, so we can pull [batch_size, num_lstm_steps, num_inputs] windows (and - if stored - the LSTM's (C, h) for
+        # each layer at the first step of each window)
+        self.replayMemory = SequenceReplayMemory(num_inputs, max_size_replay,
+                                                 dim_lstm_state=2 * lstm_size * num_lstm_layers if store_lstm_states else 0)
+
         # qFunction is a namedtuple now
         self.qFunction = self.build_nn(num_inputs, num_outputs, batch_size, num_lstm_steps, lstm_size, num_lstm_layers, learning_rate)
 
+    # adds consecutive steps of one episode to our sequence memory
+    # - new_episode: whether the given items start a new episode
+    # - lstm_states: the recurrent state at each of the given steps (ignored if we don't store LSTM states)
+    def add_items_to_replay_memory(self, items: list, new_episode: bool=False, lstm_states: Union[np.ndarray, None]=None) -> None:
+        if self.replayMemory.dimLSTMState == 0:
+            lstm_states = None
+        self.replayMemory.add_items(items, new_episode=new_episode, lstm_states=lstm_states)
+
     # builds the LSTM + the two different deep learning heads in tensorflow
     @staticmethod
     def build_nn(num_inputs: int, num_outputs: int=100, batch_size: int=50, num_steps: int=50, lstm_size: int=128,
@@ -546,44 +2122,14 @@ class LSTMGameObjectQLearner(BasicQLearner):
 
         return graph  # graph.inputs = inputs, graph.cost = cost, etc...
 
-    # runs the LSTM training procedure
-    # - feeds in batch-size x num-steps x input-dim tensors into the network and receives only one output image after each input sequence
-    # - sequences of different length are handled by padding with zero-inputs at the end
-    def run(self, options: dict={}) -> None:
-        # get the experiences from the options dict or from our buffer
-        if options["experiences"]:
-            experiences = options["experiences"]
-            self.add_items_to_replay_memory(experiences)
-        else:
-            experiences = self.replayMemory.get_random_items(self.batch_size)
-
-
-        # do the prioritized sweeping part
-        sweeps = 0
-        while len(self.replayMemory) > 0 and sweeps < self.maxNumSweeps:
-            # pull top item
-            p, s, a, r, s_ = self.replayMemory.get_item()
-            sweeps += 1
-            q_sa = self.qFunction.get_q_value(s, a)
-            max_a_ = self.qFunction.get_max_a(s_)
-            new_q_sa = q_sa + self.learningRate * (r + self.gamma * max_a_ - q_sa)
-            self.qFunction.upsert_q_value(s, a, new_q_sa)
+    # stores the given experiences (consecutive steps of one episode) in our sequence memory
+    # - training on the sampled [batch_size, num_lstm_steps, num_inputs] windows is not part of this learner yet: the pre-train head's targets
+    #   (the next game images) are not part of the uploaded experiences, so there is nothing to fit the network's outputs against
+    # - lstmStates (optional): the recurrent state at each of the given steps (only stored if the learner was built with store_lstm_states)
+    def iterate(self, options: dict={}) -> Iterator[None]:
+        if options.get("experiences"):
+            self.add_items_to_replay_memory(options["experiences"], new_episode=options.get("newEpisode", False),
+                                            lstm_states=options.get("lstmStates"))
+        yield
 
-            # get all s-1/a-1 (t-1) predicted (by our model) to end up in s
-            predecessors = self.model.get_sar_leading_to_s_(s)
-            for s_pre, a_pre, r_pre in predecessors:
-                self.add_items_to_replay_memory([(s_pre, a_pre, r_pre, s)])
-
-            # sync our table with client every n batches
-            # send some progress report to client
-            if sweeps % self.clientSyncFrequency == 0:
-                # report approximate progress (not more than 99%)
-                # - we don't know exact progress as we cannot estimate the items that get pushed into the queue each iteration
-                self.callback({"event": "progress", "algorithmName": self.name, "pct": min(int(100 * sweeps / self.maxNumSweeps), 99.0)})
-
-        # only when we are all done do we send a table refresh
-        q_table_to_send = {}
-        for key, value in self.qFunction.items():
-            q_table_to_send[str(key)] = value
-        self.callback({"event": "qTableSync", "algorithmName": self.name, "qTable": q_table_to_send})
         self.callback({"event": "progress", "algorithmName": self.name, "pct": 100})
@@ -0,0 +1,5 @@
+# a 1D corridor of 5 cells (action 0=left, 1=right); moving right out of cell 3 into the goal (4) gives a reward of 10
+# - returns one sars' tuple for each (non-goal cell, action) pair
+def get_corridor_experiences():
+    return [((x,), a, 10.0 if (x == 3 and a == 1) else 0.0, (max(x - 1, 0),) if a == 0 else (min(x + 1, 4),))
+            for x in range(4) for a in range(2)]
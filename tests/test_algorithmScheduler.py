@@ -0,0 +1,105 @@
+import os
+import sys
+import unittest
+from unittest import mock
+from twisted.internet.task import Clock
+import shine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server"))
+from server_protocol import AlgorithmScheduler, Job  # noqa: E402
+
+
+class CountingAlgorithm(shine.Algorithm):
+    """
+    an algorithm whose steps each take a fixed amount of (fake) time
+    """
+
+    def __init__(self, name, clock, num_steps=100, step_seconds=0.001):
+        super().__init__(name, lambda obj: None)
+        self.clock = clock
+        self.numSteps = num_steps
+        self.stepSeconds = step_seconds
+
+    def iterate(self, options={}):
+        for _ in range(self.numSteps):
+            if not self.checkpoint():
+                break
+            self.clock[0] += self.stepSeconds
+            self.numUpdates += 1
+            yield
+
+    def reset_parameters(self):
+        pass
+
+    def set_hyperparameters(self, **kwargs):
+        pass
+
+
+class TestAlgorithmScheduler(unittest.TestCase):
+    def setUp(self):
+        # the time as seen by Algorithm.step (advanced by the algorithms' steps only)
+        self.now = [0.0]
+        patcher = mock.patch.object(shine.shine.time, "perf_counter", lambda: self.now[0])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.reactor = Clock()
+        self.scheduler = AlgorithmScheduler(self.reactor, tick_interval=0.05, time_budget=0.0105)
+
+    def test_fair_slicing(self):
+        a, b = CountingAlgorithm("a", self.now), CountingAlgorithm("b", self.now)
+        done = []
+        self.scheduler.submit(a, {}).addCallback(lambda _: done.append("a"))
+        self.scheduler.submit(b, {}).addCallback(lambda _: done.append("b"))
+        # nothing happens before the first tick
+        self.assertEqual((a.numUpdates, b.numUpdates), (0, 0))
+        self.reactor.advance(0.05)
+        # each run gets half of the tick's budget
+        self.assertEqual((a.numUpdates, b.numUpdates), (6, 6))
+        self.reactor.pump([0.05] * 20)
+        self.assertEqual((a.numUpdates, b.numUpdates), (100, 100))
+        self.assertEqual(sorted(done), ["a", "b"])
+        # no more runs: the scheduler stops ticking
+        self.assertFalse(self.scheduler.loop.running)
+
+    def test_skip_paused(self):
+        a, b = CountingAlgorithm("a", self.now), CountingAlgorithm("b", self.now)
+        job = Job(0, a)
+        self.scheduler.submit(a, {}, job)
+        self.scheduler.submit(b, {})
+        self.reactor.advance(0.05)
+        job.pause()
+        self.reactor.advance(0.05)
+        self.assertEqual((a.numUpdates, b.numUpdates), (6, 12))
+        job.resume()
+        self.reactor.advance(0.05)
+        self.assertEqual((a.numUpdates, b.numUpdates), (12, 18))
+
+    def test_cancel_while_queued(self):
+        a = CountingAlgorithm("a", self.now, num_steps=10)
+        job = Job(0, a)
+        done = []
+        self.scheduler.submit(a, {})
+        self.scheduler.submit(a, {}, job).addCallback(done.append)
+        job.cancel()
+        self.reactor.pump([0.05] * 3)
+        # the queued run never started, but its Deferred fired
+        self.assertEqual(a.numUpdates, 10)
+        self.assertEqual(len(done), 1)
+        self.assertEqual(job.status, "cancelled")
+        self.assertIsNone(job.startTime)
+        self.assertEqual(self.scheduler.runs, {})
+
+    def test_failed_run(self):
+        a = CountingAlgorithm("a", self.now)
+        a.iterate = lambda options: iter([1 / 0])
+        job = Job(0, a)
+        failures = []
+        self.scheduler.submit(a, {}, job).addErrback(failures.append)
+        self.reactor.advance(0.05)
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(job.status, "failed")
+        self.assertIsNone(a.currentRun)
+
+
+if __name__ == '__main__':
+    unittest.main()
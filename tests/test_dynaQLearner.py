@@ -0,0 +1,36 @@
+import unittest
+from shine import DynaQLearner, TabularDeterministicWorldModel, QTable, StateInterner
+from tests.corridor import get_corridor_experiences
+
+
+class TestDynaQLearner(unittest.TestCase):
+    def test_run(self):
+        experiences = get_corridor_experiences()
+        algo = DynaQLearner("dyna", lambda obj: None, learning_rate=0.5, gamma=0.5, num_planning_steps=0)
+        algo.qFunction = QTable(2)
+        algo.model = TabularDeterministicWorldModel(2)
+        algo.stateInterner = StateInterner()
+        algo.run({"experiences": experiences})
+        self.assertEqual(len(algo.model), 8)
+        self.assertAlmostEqual(algo.qFunction.get_q_value(algo.stateInterner.intern((3,)), 1), 5.0)
+        # planning (more steps for this run only)
+        algo.run({"experiences": [], "numPlanningSteps": 5000})
+        self.assertAlmostEqual(algo.qFunction.get_q_value(algo.stateInterner.intern((3,)), 1), 10.0)
+        self.assertAlmostEqual(algo.qFunction.get_q_value(algo.stateInterner.intern((2,)), 1), 5.0)
+
+    def test_step(self):
+        algo = DynaQLearner("dyna", lambda obj: None, num_planning_steps=10, planning_batch_size=4)
+        algo.qFunction = QTable(2)
+        algo.model = TabularDeterministicWorldModel(2)
+        algo.start({"experiences": [((0,), 1, 1.0, (1,))]})
+        # a zero time budget still does one planning batch per step
+        self.assertTrue(algo.step(0.0))
+        self.assertEqual(algo.numUpdates, 1 + 4)
+        self.assertTrue(algo.step(0.0))
+        self.assertFalse(algo.step(10.0))
+        self.assertEqual(algo.numUpdates, 1 + 10)
+        self.assertIsNone(algo.currentRun)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from shine import HogwildQLearner, SharedDenseQTable
+from tests.corridor import get_corridor_experiences
+
+
+class TestHogwildQLearner(unittest.TestCase):
+    def test_run(self):
+        algo = HogwildQLearner("hogwild", lambda obj: None, learning_rate=0.5, gamma=0.5, max_num_batches=400, batch_size=16,
+                               num_workers=2, dim_state=1)
+        algo.qFunction = SharedDenseQTable((5,), 2)
+        algo.add_items_to_replay_memory(get_corridor_experiences())
+        algo.run()
+        # the workers updated the table that we see
+        self.assertAlmostEqual(algo.qFunction.get_q_value((3,), 1), 10.0, places=3)
+        self.assertAlmostEqual(algo.qFunction.get_q_value((2,), 1), 5.0, places=3)
+        self.assertAlmostEqual(algo.qFunction.get_q_value((2,), 0), 1.25, places=3)
+        self.assertEqual(algo.numUpdates, 400 * 16)
+        # the update count goes on over all runs
+        algo.run()
+        self.assertEqual(algo.numUpdates, 2 * 400 * 16)
+
+    def test_cancel(self):
+        algo = HogwildQLearner("hogwild", lambda obj: None, max_num_batches=10 ** 9, num_workers=2, dim_state=1)
+        algo.qFunction = SharedDenseQTable((5,), 2)
+        algo.add_items_to_replay_memory(get_corridor_experiences())
+        algo.start()
+        self.assertTrue(algo.step(0.2))
+        algo.cancel()
+        self.assertFalse(algo.step(1.0))
+        self.assertGreater(algo.numUpdates, 0)
+
+    def test_pause(self):
+        algo = HogwildQLearner("hogwild", lambda obj: None, max_num_batches=10 ** 9, num_workers=2, dim_state=1)
+        algo.qFunction = SharedDenseQTable((5,), 2)
+        algo.add_items_to_replay_memory(get_corridor_experiences())
+        algo.start()
+        self.assertTrue(algo.step(0.2))
+        # the pause reaches the workers right away (not only with the next step)
+        algo.pause()
+        self.assertEqual(algo.workerControl.get_array()[0], HogwildQLearner.PAUSED)
+        algo.resume()
+        self.assertEqual(algo.workerControl.get_array()[0], HogwildQLearner.RUNNING)
+        algo.cancel()
+        self.assertFalse(algo.step(1.0))
+        self.assertIsNone(algo.workerControl)
+
+    def test_spawn(self):
+        # spawned workers get the shared memory handles (not copies of the table and the memory) passed
+        algo = HogwildQLearner("hogwild", lambda obj: None, learning_rate=0.5, gamma=0.5, max_num_batches=200, batch_size=16,
+                               num_workers=2, dim_state=1, start_method="spawn")
+        algo.qFunction = SharedDenseQTable((5,), 2)
+        algo.add_items_to_replay_memory(get_corridor_experiences())
+        algo.run()
+        self.assertAlmostEqual(algo.qFunction.get_q_value((3,), 1), 10.0, places=3)
+        self.assertEqual(len(algo.qFunction), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
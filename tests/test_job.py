@@ -0,0 +1,68 @@
+import os
+import sys
+import unittest
+from unittest import mock
+from shine import DynaQLearner
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server"))
+import server_protocol  # noqa: E402
+from server_protocol import Job  # noqa: E402
+
+
+class TestJob(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(server_protocol.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.algo = DynaQLearner("dyna", lambda obj: None)
+
+    def test_pause_while_queued(self):
+        # time spent paused in the queue must not be subtracted from the running time
+        job = Job(0, self.algo)
+        job.pause()
+        self.now += 50.0
+        job.resume()
+        self.assertEqual(job.status, "queued")
+        self.assertTrue(job.begin())
+        self.now += 10.0
+        self.algo.numUpdates += 100
+        job.end()
+        self.assertEqual(job.get_throughput(), (100, 10.0))
+
+    def test_pause_while_running(self):
+        job = Job(0, self.algo)
+        job.begin()
+        self.now += 5.0
+        job.pause()
+        self.assertFalse(self.algo.notPausedEvent.is_set())
+        self.now += 50.0
+        self.assertEqual(job.get_throughput(), (0, 0.0))
+        job.resume()
+        self.now += 5.0
+        self.algo.numUpdates += 100
+        self.assertEqual(job.get_throughput(), (100, 10.0))
+
+    def test_begin_paused(self):
+        # a job that is still paused when it gets started starts its algorithm paused
+        job = Job(0, self.algo)
+        job.pause()
+        self.assertTrue(job.begin())
+        self.assertFalse(self.algo.notPausedEvent.is_set())
+        self.now += 50.0
+        job.resume()
+        self.assertEqual(job.status, "running")
+        self.now += 10.0
+        self.algo.numUpdates += 100
+        self.assertEqual(job.get_throughput(), (100, 10.0))
+
+    def test_cancel_while_queued(self):
+        job = Job(0, self.algo)
+        job.cancel()
+        self.assertFalse(job.begin())
+        self.assertFalse(job.is_active())
+        self.assertFalse(self.algo.cancelled)
+
+
+if __name__ == '__main__':
+    unittest.main()
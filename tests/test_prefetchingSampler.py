@@ -0,0 +1,23 @@
+import unittest
+from shine import PrefetchingSampler, ReplayMemory
+
+
+class TestPrefetchingSampler(unittest.TestCase):
+    def test_get_batch(self):
+        t = ReplayMemory()
+        t.add_items([((1, 2), 6, -1, (1, 3)), ((1, 3), 5, -1, (1, 3))])
+        sampler = PrefetchingSampler(t.sample_batch, 2, num_prefetch=2, max_num_batches=3)
+        for _ in range(3):
+            self.assertEqual(len(sampler.get_batch().indices), 2)
+        sampler.stop()
+
+    def test_error(self):
+        def sample(_):
+            raise ValueError("bad sample")
+        sampler = PrefetchingSampler(sample, 2)
+        self.assertRaises(ValueError, sampler.get_batch)
+        sampler.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import numpy as np
+from shine import PriorityReplayMemory, IndexedPriorityReplayMemory, SumTree
+
+
+class TestSumTree(unittest.TestCase):
+    def test_update_and_find(self):
+        t = SumTree(5)
+        t.update([0, 1, 2, 3, 4], [1.0, 2.0, 0.0, 3.0, 4.0])
+        self.assertEqual(t.total(), 10.0)
+        self.assertEqual(t.max(), 4.0)
+        self.assertEqual(t.argmax(), 4)
+        self.assertEqual(t.argmin(), 2)
+        self.assertEqual(list(t.find_prefix_sum_indices([0.5, 1.5, 3.5, 9.9])), [0, 1, 3, 4])
+        t.clear(4)
+        self.assertEqual(t.total(), 6.0)
+        self.assertEqual(t.argmax(), 3)
+        self.assertEqual(t.min(), 0.0)
+
+    def test_top_k(self):
+        t = SumTree(1000)
+        values = np.random.random(1000)
+        values[[10, 500]] = 2.0
+        t.update(np.arange(1000), values)
+        t.clear(np.arange(0, 1000, 2))
+        expected = np.arange(1, 1000, 2)[np.argsort(-values[1::2], kind="stable")]
+        self.assertEqual(list(t.top_k(10)), list(expected[:10]))
+        self.assertEqual(list(t.top_k(1000)), list(expected))
+        self.assertEqual(len(SumTree(4).top_k(3)), 0)
+
+
+class TestPriorityReplayMemory(unittest.TestCase):
+    def test_get_item(self):
+        t = PriorityReplayMemory()
+        t.add_items([(-0.5, (1, 2), 6, -1, (1, 3)), (-2.0, (1, 3), 5, -1, (1, 3))])
+        self.assertEqual(len(t), 2)
+        self.assertEqual(t.get_item(), (-2.0, (1, 3), 5, -1, (1, 3)))
+        self.assertEqual(t.get_item(), (-0.5, (1, 2), 6, -1, (1, 3)))
+        self.assertIsNone(t.get_item())
+        self.assertEqual(len(t), 0)
+
+    def test_pop_items(self):
+        t = PriorityReplayMemory()
+        t.add_items([(-float(p), (p,), 0, 0.0, (p + 1,)) for p in [3, 1, 4, 2, 5]])
+        self.assertEqual([item[0] for item in t.pop_items(3)], [-5.0, -4.0, -3.0])
+        self.assertEqual(len(t), 2)
+        self.assertEqual([item[0] for item in t.pop_items(3)], [-2.0, -1.0])
+        self.assertEqual(t.pop_items(3), [])
+
+    def test_add_items_when_full(self):
+        t = PriorityReplayMemory(max_size=2)
+        # must not block once we are full
+        t.add_items([(-1.0, (0,), 0, 0.0, (1,)), (-1.0, (1,), 0, 0.0, (2,)), (-1.0, (2,), 0, 0.0, (3,))])
+        self.assertEqual(len(t), 2)
+
+    def test_grow(self):
+        # storage is allocated as needed (max_size=0: unlimited)
+        for max_size in [0, 3000]:
+            t = PriorityReplayMemory(max_size=max_size)
+            self.assertEqual(t.capacity, PriorityReplayMemory.INITIAL_CAPACITY)
+            t.add_items([(-float(p), (p,), 0, 0.0, (p + 1,)) for p in range(5000)])
+            self.assertEqual(len(t), 5000 if max_size == 0 else 3000)
+            self.assertEqual(t.capacity, 8192 if max_size == 0 else 3000)
+            self.assertAlmostEqual(t.tree.total(), float(np.sum(t.priorities[t.occupied] ** t.alpha)), places=6)
+            self.assertEqual([item[0] for item in t.pop_items(2)], [-4999.0, -4998.0])
+        self.assertEqual(len(PriorityReplayMemory().items), PriorityReplayMemory.INITIAL_CAPACITY)
+
+    def test_evict_lowest_priority(self):
+        t = PriorityReplayMemory(max_size=3)
+        t.add_items([(-2.0, (0,), 0, 0.0, (1,)), (-0.5, (1,), 0, 0.0, (2,)), (-3.0, (2,), 0, 0.0, (3,))])
+        # evicts the item with p=0.5
+        t.add_items([(-1.0, (3,), 0, 0.0, (4,))])
+        # lower than all stored priorities -> dropped
+        t.add_items([(-0.1, (4,), 0, 0.0, (5,))])
+        self.assertEqual(len(t), 3)
+        self.assertEqual([item[0] for item in t.iterate()], [-3.0, -2.0, -1.0])
+
+    def test_sample(self):
+        for mode in ["proportional", "rank"]:
+            t = PriorityReplayMemory(sampling_mode=mode)
+            t.add_items([(-0.1, (1, 2), 6, -1, (1, 3)), (-10.0, (1, 3), 5, -1, (1, 3))])
+            items, indices, weights = t.sample(4)
+            self.assertEqual(len(items), 4)
+            self.assertTrue(np.all(weights <= 1.0))
+            # sampling does not remove items
+            self.assertEqual(len(t), 2)
+            t.update_priorities(indices, [1.0] * 4)
+            self.assertTrue(np.allclose(t.priorities[indices], 1.0))
+
+
+class TestIndexedPriorityReplayMemory(unittest.TestCase):
+    def test_deduplication(self):
+        m = IndexedPriorityReplayMemory(10)
+        m.add_items([(-1.0, (0, 0), 1, -1.0, (0, 1)), (-3.0, (0, 1), 2, -1.0, (1, 1)), (-2.0, (0, 0), 1, 5.0, (0, 2))])
+        self.assertEqual(len(m), 2)
+        # keeps the max priority per (s, a), but the newest transition
+        self.assertEqual(m.priorities[m.get_slot((0, 0), 1)], 2.0)
+        self.assertEqual(m.items[m.get_slot((0, 0), 1)], ((0, 0), 1, 5.0, (0, 2)))
+        m.add_items([(-0.5, (0, 1), 2, -1.0, (1, 1))])
+        self.assertEqual(len(m), 2)
+        self.assertEqual(m.get_item(), (-3.0, (0, 1), 2, -1.0, (1, 1)))
+        self.assertIsNone(m.get_slot((0, 1), 2))
+        self.assertEqual(m.get_item(), (-2.0, (0, 0), 1, 5.0, (0, 2)))
+        self.assertEqual(len(m), 0)
+
+    def test_add_items_when_full(self):
+        m = IndexedPriorityReplayMemory(2)
+        m.add_items([(-float(i + 1), i, 0, 0.0, i + 1) for i in range(3)])
+        self.assertEqual(len(m), 2)
+        self.assertEqual(len(m.slotsByKey), 2)
+        self.assertIsNone(m.get_slot(0, 0))
+        m.add_items([(-0.5, 3, 0, 0.0, 4)])
+        self.assertIsNone(m.get_slot(3, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import unittest
+from unittest import mock
+from shine import DynaQLearner, TabularDeterministicWorldModel, QTable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server"))
+import server_protocol  # noqa: E402
+from server_protocol import Project, Job  # noqa: E402
+
+
+class SynchronousReactor(object):
+    """
+    stands in for the reactor: calls from (fake) worker threads are executed right away
+    """
+
+    @staticmethod
+    def callFromThread(f, *args, **kwargs):
+        f(*args, **kwargs)
+
+
+class SynchronousThreadPool(object):
+    """
+    stands in for a twisted ThreadPool: executes each call right away (and counts the calls)
+    """
+
+    def __init__(self):
+        self.numCalls = 0
+
+    def callInThreadWithCallback(self, on_result, f, *args, **kwargs):
+        self.numCalls += 1
+        try:
+            result = f(*args, **kwargs)
+        except Exception:
+            on_result(False, server_protocol.Failure())
+        else:
+            on_result(True, result)
+
+
+class TestProject(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(server_protocol, "reactor", SynchronousReactor())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.project = Project("project", "user")
+        self.threadPool = SynchronousThreadPool()
+        self.events = []
+        algo = DynaQLearner("dyna", self.events.append, num_planning_steps=100, planning_batch_size=1, client_sync_frequency=1)
+        algo.qFunction = QTable(2)
+        algo.model = TabularDeterministicWorldModel(2)
+        self.project.algorithms["dyna"] = algo
+        self.options = {"experiences": [((0,), 1, 1.0, (1,))]}
+
+    def test_run_without_job_after_cancel(self):
+        # a cancelled (or paused) job must not stop the following runs that have no job
+        algo = self.project.algorithms["dyna"]
+        algo.cancel()
+        done = []
+        self.project.run_algorithm("dyna", self.options, self.threadPool).addCallback(done.append)
+        self.assertEqual(len(done), 1)
+        self.assertEqual(algo.numUpdates, 1 + 100)
+
+    def test_callback_from_worker_thread(self):
+        # events from worker threads get handed over to the reactor thread, events on the reactor thread are handled right away
+        reactor = mock.Mock()
+        with mock.patch.object(server_protocol, "reactor", reactor), mock.patch.object(server_protocol, "isInIOThread", lambda: False):
+            self.project.algorithm_callback({"event": "progress", "algorithmName": "dyna", "pct": 50})
+        reactor.callFromThread.assert_called_once_with(self.project.handle_algorithm_event,
+                                                       {"event": "progress", "algorithmName": "dyna", "pct": 50})
+        protocol = mock.Mock()
+        self.project._v_ShineProtocol = protocol
+        with mock.patch.object(server_protocol, "isInIOThread", lambda: True):
+            self.project.algorithm_callback({"event": "progress", "algorithmName": "dyna", "pct": 50})
+        protocol.send_json.assert_called_once_with({"notify": "algo progress", "pct": 50, "projectName": "project", "algorithm": "dyna"})
+
+    def test_paused_job_gives_thread_back(self):
+        algo = self.project.algorithms["dyna"]
+        job = Job(0, algo)
+        algo.callback = lambda obj: job.pause() if obj.get("pct") == 10 else None
+        done = []
+        self.project.run_algorithm("dyna", self.options, self.threadPool, job).addCallback(done.append)
+        # the run left its thread after the pause and waits for the job to be resumed
+        self.assertEqual(job.status, "paused")
+        self.assertEqual(len(done), 0)
+        self.assertEqual(self.threadPool.numCalls, 1)
+        self.assertLess(algo.numUpdates, 1 + 100)
+        # other runs of the same algorithm stay queued behind the paused one
+        self.project.run_algorithm("dyna", {"experiences": []}, self.threadPool)
+        self.assertEqual(self.threadPool.numCalls, 1)
+        job.resume()
+        self.assertEqual(len(done), 1)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(algo.numUpdates, 1 + 100 + 100)
+
+    def test_cancel_paused_job(self):
+        algo = self.project.algorithms["dyna"]
+        job = Job(0, algo)
+        algo.callback = lambda obj: job.pause() if obj.get("pct") == 10 else None
+        done = []
+        self.project.run_algorithm("dyna", self.options, self.threadPool, job).addCallback(done.append)
+        num_updates = algo.numUpdates
+        job.cancel()
+        self.assertEqual(len(done), 1)
+        self.assertEqual(job.status, "cancelled")
+        self.assertEqual(algo.numUpdates, num_updates)
+        self.assertIsNone(algo.currentRun)
+
+    def test_failed_run(self):
+        algo = self.project.algorithms["dyna"]
+        algo.model = None
+        job = Job(0, algo)
+        failures = []
+        self.project.run_algorithm("dyna", self.options, self.threadPool, job).addErrback(failures.append)
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(job.status, "failed")
+        self.assertIsNone(algo.currentRun)
+
+
+if __name__ == '__main__':
+    unittest.main()
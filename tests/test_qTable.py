@@ -0,0 +1,117 @@
+import unittest
+import numpy as np
+from shine import QTable, DenseQTable
+
+
+class TestQTable(unittest.TestCase):
+    def test_max_a_cache(self):
+        t = QTable(3)
+        self.assertEqual(t.get_max_a((1, 2)), 0.0)
+        t.upsert_q_value((1, 2), 1, 2.0)
+        self.assertEqual(t.get_max_a((1, 2)), 2.0)
+        self.assertEqual(t.get_greedy_action((1, 2)), 1)
+        t.upsert_q_value((1, 2), 2, 1.0)
+        self.assertEqual(t.get_greedy_action((1, 2)), 1)
+        # the greedy action gets worse -> the next best one takes over
+        t.upsert_q_value((1, 2), 1, -1.0)
+        self.assertEqual(t.get_max_a((1, 2)), 1.0)
+        self.assertEqual(t.get_greedy_action((1, 2)), 2)
+        t.upsert_q_value((1, 2), 2, -2.0)
+        self.assertEqual(t.get_max_a((1, 2)), 0.0)
+        self.assertEqual(t.get_greedy_action((1, 2)), 0)
+        t.clear()
+        self.assertEqual(len(t.maxQs), 0)
+
+    def test_reads_dont_materialize(self):
+        t = QTable(3)
+        self.assertEqual(t.get_q_value((1, 2), 0), 0.0)
+        self.assertEqual(t.get_max_a((1, 3)), 0.0)
+        self.assertEqual(len(t), 0)
+        t.upsert_q_value((1, 2), 0, 1.0)
+        self.assertEqual(len(t), 1)
+        t = QTable(3, materialize_on_read=True)
+        t.get_max_a((1, 3))
+        self.assertEqual(len(t), 1)
+
+    def test_pop_changes(self):
+        for t in [QTable(2), DenseQTable((3, 3), 2)]:
+            t.upsert_q_value((1, 2), 0, 1.0)
+            t.upsert_q_value((2, 2), 1, 2.0)
+            version, rows = t.pop_changes()
+            self.assertEqual(version, 1)
+            self.assertEqual(sorted(rows), [((1, 2), [1.0, 0.0]), ((2, 2), [0.0, 2.0])])
+            t.upsert_q_value((2, 2), 0, 3.0)
+            self.assertEqual(t.pop_changes(), (2, [((2, 2), [3.0, 2.0])]))
+            self.assertEqual(t.pop_changes(), (3, []))
+            self.assertEqual(len(t.pop_changes(full=True)[1]), 2)
+
+    def test_pop_changes_keeps_concurrent_updates(self):
+        t = DenseQTable((3, 3), 2)
+        t.upsert_q_value((1, 2), 0, 1.0)
+        get_rows = t.get_rows
+
+        # another process (e.g. a Hogwild worker) updates a row while the changes are being read
+        def get_rows_with_concurrent_update(indices):
+            t.upsert_q_value((0, 0), 1, 5.0)
+            return get_rows(indices)
+
+        t.get_rows = get_rows_with_concurrent_update
+        self.assertEqual(t.pop_changes()[1], [((1, 2), [1.0, 0.0])])
+        t.get_rows = get_rows
+        self.assertEqual(t.pop_changes()[1], [((0, 0), [0.0, 5.0])])
+
+    def test_batch_methods(self):
+        t = QTable(3)
+        t.upsert_q_values(np.array([[1, 2], [1, 3]]), np.array([0, 2]), np.array([0.5, -1.0]))
+        self.assertEqual(t.get_q_value((1, 2), 0), 0.5)
+        self.assertEqual(t.get_q_values([(1, 2), (1, 3)], [0, 2]).tolist(), [0.5, -1.0])
+        self.assertEqual(t.get_max_as(np.array([[1, 2], [1, 3]])).tolist(), [0.5, 0.0])
+
+    def test_backup_q_values(self):
+        for t in [QTable(2), DenseQTable((3, 3), 2)]:
+            # (1, 1)/0 appears twice with the same target: same result as two sequential backups
+            t.backup_q_values(np.array([[1, 1], [1, 1], [2, 2]]), [0, 0, 1], [1.0, 1.0, -1.0], 0.5)
+            self.assertAlmostEqual(t.get_q_value((1, 1), 0), 0.75)
+            self.assertAlmostEqual(t.get_q_value((2, 2), 1), -0.5)
+            t.backup_q_values([(2, 2)], [1], [0.5], np.array([0.0]))
+            self.assertAlmostEqual(t.get_q_value((2, 2), 1), -0.5)
+
+    def test_combine_backups_large_learning_rates(self):
+        # learning rates of 1 (and above) must match sequential backups without any warnings or NaNs
+        q = np.array([2.0, 2.0, 2.0])
+        inverse = np.array([0, 1, 1, 2, 2])
+        targets = np.array([1.0, 1.0, 1.0, 1.0, 1.0])
+        learning_rates = np.array([1.0, 1.0, 0.5, 1.5, 1.5])
+        with np.errstate(all="raise"):
+            combined = QTable.combine_backups(q, inverse, targets, learning_rates)
+        expected = q.copy()
+        for i, target, lr in zip(inverse, targets, learning_rates):
+            expected[i] += lr * (target - expected[i])
+        np.testing.assert_allclose(combined, expected)
+
+
+class TestDenseQTable(unittest.TestCase):
+    def test_q_values(self):
+        t = DenseQTable((4, 5), 3)
+        self.assertEqual(t.get_q_value((1, 2), 0), 0.0)
+        t.upsert_q_value((1, 2), 1, 2.5)
+        self.assertEqual(t.get_q_value((1, 2), 1), 2.5)
+        self.assertEqual(t.get_max_a((1, 2)), 2.5)
+        self.assertEqual(len(t), 1)
+        self.assertEqual(list(t.items()), [((1, 2), [0.0, 2.5, 0.0])])
+        self.assertRaises(IndexError, t.get_q_value, (4, 0), 0)
+        self.assertRaises(IndexError, t.get_q_value, (-1, 0), 0)
+
+    def test_batch_methods(self):
+        t = DenseQTable((4, 5), 3, state_space_low=(-1, 0))
+        states = np.array([[-1, 0], [2, 4]])
+        t.upsert_q_values(states, [2, 0], [1.0, -1.0])
+        self.assertEqual(t.get_q_values(states, [2, 0]).tolist(), [1.0, -1.0])
+        self.assertEqual(t.get_max_as(states).tolist(), [1.0, 0.0])
+        self.assertTrue((2, 4) in t)
+        t.clear()
+        self.assertEqual(len(t), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from shine import RandomSampleOneStepTabularQLearner, ReplayMemory, RingBufferReplayMemory, PriorityReplayMemory, QTable, DenseQTable, \
+    StateInterner
+from tests.corridor import get_corridor_experiences
+
+
+class TestRandomSampleOneStepTabularQLearner(unittest.TestCase):
+    def test_batched_updates(self):
+        for replay_memory, q_table, interned in [(ReplayMemory(), QTable(2), True), (RingBufferReplayMemory(1, 100, np.int32), QTable(2), True),
+                                                 (RingBufferReplayMemory(1, 100, np.int32), DenseQTable((5,), 2), False),
+                                                 (PriorityReplayMemory(), DenseQTable((5,), 2), False)]:
+            algo = RandomSampleOneStepTabularQLearner("rs", lambda obj: None, learning_rate=0.5, gamma=0.5, max_num_batches=300, batch_size=8,
+                                                      replay_memory=replay_memory, batched_updates=True)
+            algo.qFunction = q_table
+            algo.stateInterner = StateInterner() if interned else None
+            algo.add_items_to_replay_memory(get_corridor_experiences())
+            # a dict-backed table falls back to the (faster) per-item backups
+            self.assertEqual(algo.uses_batched_updates(), isinstance(q_table, DenseQTable))
+            with np.errstate(all="raise"):
+                algo.run()
+            self.assertEqual(algo.numUpdates, 300 * 8)
+
+            def q(s, a):
+                return algo.qFunction.get_q_value(algo.stateInterner.intern(s) if interned else s, a)
+            self.assertAlmostEqual(q((3,), 1), 10.0, places=3)
+            self.assertAlmostEqual(q((2,), 1), 5.0, places=3)
+            self.assertAlmostEqual(q((2,), 0), 1.25, places=3)
+
+    def test_learning_rate_one(self):
+        # a learning rate of 1 replaces the q-values by their targets
+        algo = RandomSampleOneStepTabularQLearner("rs", lambda obj: None, learning_rate=1.0, gamma=0.5, max_num_batches=50, batch_size=16,
+                                                  replay_memory=RingBufferReplayMemory(1, 100, np.int32), batched_updates=True)
+        algo.qFunction = DenseQTable((5,), 2)
+        algo.add_items_to_replay_memory(get_corridor_experiences())
+        with np.errstate(all="raise"):
+            algo.run()
+        self.assertEqual(algo.qFunction.get_q_value((3,), 1), 10.0)
+        self.assertEqual(algo.qFunction.get_q_value((1,), 1), 2.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,6 +17,17 @@ class TestReplayMemory(unittest.TestCase):
         self.assertEqual(len(sample), 1)
         self.assertEqual(len(t), 2)
 
+    def test_sample_batch(self):
+        t = ReplayMemory()
+        t.add_items([((1, 2), 6, -1, (1, 3)), ((1, 3), 5, -1, (1, 3))])
+        batch = t.sample_batch(2)
+        self.assertEqual(batch.states.shape, (2, 2))
+        self.assertEqual(batch.next_states.shape, (2, 2))
+        self.assertEqual(batch.actions.shape, (2,))
+        self.assertEqual(sorted(batch.actions.tolist()), [5, 6])
+        self.assertEqual(sorted(batch.indices.tolist()), [0, 1])
+        self.assertEqual(len(ReplayMemory().sample_batch(3).indices), 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+from shine import ReservoirReplayMemory, StratifiedReservoirReplayMemory
+
+
+class TestReservoirReplayMemory(unittest.TestCase):
+    def test_add_items(self):
+        t = ReservoirReplayMemory(max_size=100)
+        for x in range(100):
+            t.add_items([((x, y), 0, -1.0, (x, y + 1)) for y in range(100)])
+        self.assertEqual(len(t), 100)
+        self.assertEqual(t.numItemsSeen, 10000)
+        # a uniform sample of the whole stream: not just the last 100 items
+        self.assertLess(min(item[0][0] for item in t.items), 90)
+
+    def test_get_random_items(self):
+        t = ReservoirReplayMemory()
+        t.add_items([((1, 2), 6, -1, (1, 3)), ((1, 3), 5, -1, (1, 3))])
+        self.assertEqual(len(t.get_random_items(5)), 2)
+
+
+class TestStratifiedReservoirReplayMemory(unittest.TestCase):
+    def test_partitions(self):
+        t = StratifiedReservoirReplayMemory(max_size=20, recent_fraction=0.5)
+        t.add_items([((x,), 0, -1.0, (x + 1,)) for x in range(1000)])
+        self.assertEqual(len(t), 20)
+        self.assertEqual(sorted(item[0][0] for item in t.recentItems), list(range(990, 1000)))
+        sample = t.get_random_items(10)
+        self.assertEqual(sum(1 for item in sample if item[0][0] >= 990), 5)
+        batch = t.sample_batch(6)
+        self.assertEqual(batch.states.shape, (6, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import tempfile
+from shine import RingBufferReplayMemory, MemoryMappedReplayMemory
+
+
+class TestRingBufferReplayMemory(unittest.TestCase):
+    def test_add_items(self):
+        t = RingBufferReplayMemory(2, max_size=3)
+        t.add_items([((1, 2), 6, -1, (1, 3)), ((1, 3), 5, -1, (1, 3))])
+        self.assertEqual(len(t), 2)
+        # overflow: oldest item gets overwritten in place
+        t.add_items([((2, 3), 1, 0.5, (2, 4)), ((2, 4), 2, 1.0, (2, 5))])
+        self.assertEqual(len(t), 3)
+        self.assertEqual(t.get_items([0]), [((2.0, 4.0), 2, 1.0, (2.0, 5.0))])
+
+    def test_get_random_items(self):
+        t = RingBufferReplayMemory(2)
+        t.add_items([((1, 2), 6, -1, (1, 3)), ((1, 3), 5, -1, (1, 3))])
+        sample = t.get_random_items(1)
+        self.assertEqual(type(sample), list)
+        self.assertEqual(type(sample[0]), tuple)
+        self.assertEqual(len(sample), 1)
+        # states come back as tuples that can be used as q-table keys
+        self.assertIn(sample[0][0], [(1, 2), (1, 3)])
+        self.assertEqual(len(RingBufferReplayMemory(2).get_random_items(5)), 0)
+
+    def test_sample_batch(self):
+        t = RingBufferReplayMemory(2)
+        t.add_items([((1, 2), 6, -1, (1, 3)), ((1, 3), 5, -1, (1, 3))])
+        batch = t.sample_batch(3)
+        self.assertEqual(batch.states.shape, (2, 2))
+        self.assertEqual(batch.rewards.tolist(), [-1.0, -1.0])
+        self.assertEqual(batch.actions.tolist(), [6 if i == 0 else 5 for i in batch.indices])
+
+
+class TestMemoryMappedReplayMemory(unittest.TestCase):
+    def test_reopen(self):
+        with tempfile.TemporaryDirectory() as directory:
+            t = MemoryMappedReplayMemory(directory, 2, max_size=10)
+            t.add_items([((1, 2), 6, -1, (1, 3)), ((1, 3), 5, -1, (1, 3))])
+            t.flush()
+            del t
+            # e.g. after a server restart
+            t = MemoryMappedReplayMemory(directory, 2, max_size=10)
+            self.assertEqual(len(t), 2)
+            self.assertEqual(t.get_items([1]), [((1.0, 3.0), 5, -1.0, (1.0, 3.0))])
+            t.add_items([((2, 3), 1, 0.5, (2, 4))])
+            self.assertEqual(len(t), 3)
+            self.assertEqual(len(t.get_random_items(2)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
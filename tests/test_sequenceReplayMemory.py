@@ -0,0 +1,26 @@
+import unittest
+import numpy as np
+from shine import SequenceReplayMemory
+
+
+class TestSequenceReplayMemory(unittest.TestCase):
+    def test_sample_sequences(self):
+        t = SequenceReplayMemory(1, max_size=10, dim_lstm_state=2)
+        # episode 1: 3 steps, episode 2: 2 steps
+        t.add_items([((0,), 0, 0.0, (1,)), ((1,), 1, 0.0, (2,)), ((2,), 2, 1.0, (3,))], lstm_states=np.ones((3, 2)))
+        t.add_items([((5,), 3, 0.0, (6,)), ((6,), 4, 1.0, (7,))], new_episode=True, lstm_states=np.full((2, 2), 2.0))
+        self.assertEqual(len(t), 5)
+        batch = t.sample_sequences(50, 3)
+        self.assertEqual(batch.states.shape, (50, 3, 1))
+        self.assertEqual(batch.mask.shape, (50, 3))
+        for i in range(50):
+            start = batch.indices[i]
+            # windows never cross an episode boundary
+            expected_len = {0: 3, 1: 2, 2: 1, 3: 2, 4: 1}[start]
+            self.assertEqual(batch.mask[i].sum(), expected_len)
+            self.assertTrue(np.all(batch.actions[i][~batch.mask[i]] == 0))
+            self.assertEqual(batch.initial_lstm_states[i][0], 1.0 if start < 3 else 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
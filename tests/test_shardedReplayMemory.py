@@ -0,0 +1,46 @@
+import unittest
+import threading
+from shine import ShardedReplayMemory, RingBufferReplayMemory
+
+
+class TestShardedReplayMemory(unittest.TestCase):
+    def test_concurrent_add_items(self):
+        t = ShardedReplayMemory(num_shards=4)
+
+        def write(x):
+            for y in range(100):
+                t.add_items([((x, y), 0, -1.0, (x, y + 1))])
+
+        threads = [threading.Thread(target=write, args=(x,)) for x in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(t), 800)
+        self.assertEqual(len(t.get_random_items(50)), 50)
+
+    def test_sample_batch(self):
+        t = ShardedReplayMemory(num_shards=2, max_size=10, shard_factory=lambda max_size: RingBufferReplayMemory(2, max_size))
+        t.add_items([((1, 2), 6, -1, (1, 3))])
+        t.add_items([((1, 3), 5, -1, (1, 3))])
+        batch = t.sample_batch(4)
+        self.assertEqual(batch.states.shape[1], 2)
+        self.assertTrue(set(batch.actions.tolist()) <= {5, 6})
+        self.assertEqual(len(ShardedReplayMemory().sample_batch(4).indices), 0)
+
+    def test_shard_counts(self):
+        # an almost empty shard next to a full one: no shard may be asked for more items than it has
+        t = ShardedReplayMemory(num_shards=2, max_size=200, shard_factory=lambda max_size: RingBufferReplayMemory(1, max_size))
+        t.shards[0].add_items([((x,), 0, 0.0, (x,)) for x in range(100)])
+        t.shards[1].add_items([((0,), 1, 0.0, (0,))])
+        for _ in range(100):
+            counts = t.get_shard_counts(101)
+            self.assertEqual(counts.tolist(), [100, 1])
+            self.assertTrue(all(t.get_shard_counts(50) <= [100, 1]))
+            self.assertEqual(len(t.sample_batch(60).actions), 60)
+            self.assertEqual(len(t.get_random_items(80)), 80)
+        self.assertEqual(t.get_shard_counts(500).tolist(), [100, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import json
+import os
+import struct
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import shine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server"))
+import server_config as conf  # noqa: E402
+import server_protocol  # noqa: E402
+from server_protocol import ShineProtocol, ShineProtocolClientMessageError, UserRecord, Project  # noqa: E402
+
+
+class TestShineProtocol(unittest.TestCase):
+    def setUp(self):
+        # a logged-in protocol (without a connection) that records what it sends
+        self.protocol = ShineProtocol(0, None, None)
+        self.protocol.userName = "user"
+        self.protocol.userRecord = UserRecord("user")
+        self.protocol.gotHelloResponse = True
+        self.protocol.currentProject = Project("project", "user")
+        self.sent = []
+        self.protocol.send_json = self.sent.append
+
+    def request(self, json_obj):
+        json_obj.update({"origin": "client", "msgType": "request", "seqNum": 0})
+        self.protocol.handle_request(json_obj)
+        return self.sent[-1]
+
+    def test_new_algorithm_q_table_limit(self):
+        # the table holds states x actions q-values
+        num_values = conf.SHINE_SERVER_MAX_Q_TABLE_VALUES
+        for state_space_shape, num_actions in [([num_values, 2], 4), ([num_values // 2], 4), ([1000, 1000], 10 ** 4)]:
+            with self.assertRaises(ShineProtocolClientMessageError):
+                self.request({"request": "new algorithm", "algorithmClass": "HogwildQLearner", "algorithmName": "hogwild",
+                              "numActions": num_actions, "stateSpaceShape": state_space_shape})
+        self.assertNotIn("hogwild", self.protocol.currentProject.algorithms)
+        self.request({"request": "new algorithm", "algorithmClass": "HogwildQLearner", "algorithmName": "hogwild", "numActions": 4,
+                      "stateSpaceShape": [10, 10]})
+        self.assertIsInstance(self.protocol.currentProject.algorithms["hogwild"].qFunction, shine.SharedDenseQTable)
+        # the server is multithreaded: its hogwild workers don't get forked from it
+        self.assertEqual(self.protocol.currentProject.algorithms["hogwild"].startMethod, conf.SHINE_SERVER_HOGWILD_START_METHOD)
+        self.request({"request": "new algorithm", "algorithmClass": "HogwildQLearner", "algorithmName": "hogwild3d", "numActions": 4,
+                      "stateSpaceShape": [10, 10, 10]})
+        self.assertEqual(self.protocol.currentProject.algorithms["hogwild3d"].replayMemory.dimState, 3)
+
+    def test_memory_mapped_replay_memory_layout(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(conf, "SHINE_SERVER_REPLAY_MEMORY_DIR", directory):
+            self.request({"request": "new world", "worldName": "vikings"})
+            self.protocol.currentProject.worlds["vikings"].dimState = 3
+            # the state layout comes from the world (float states don't get truncated) ...
+            self.request({"request": "new algorithm", "algorithmClass": "RandomSampleOneStepTabularQLearner", "algorithmName": "world",
+                          "numActions": 4, "worldName": "vikings"})
+            memory = self.protocol.currentProject.algorithms["world"].replayMemory
+            self.assertIsInstance(memory, shine.MemoryMappedReplayMemory)
+            self.assertEqual((memory.dimState, memory.stateDType), (3, np.float64))
+            # ... or from the dense table's state space
+            self.request({"request": "new algorithm", "algorithmClass": "RandomSampleOneStepTabularQLearner", "algorithmName": "dense",
+                          "numActions": 4, "stateSpaceShape": [5, 5]})
+            memory = self.protocol.currentProject.algorithms["dense"].replayMemory
+            self.assertEqual((memory.dimState, memory.stateDType), (2, np.int32))
+            # unknown layout: stays in RAM
+            self.request({"request": "new algorithm", "algorithmClass": "RandomSampleOneStepTabularQLearner", "algorithmName": "ram",
+                          "numActions": 4})
+            self.assertIsInstance(self.protocol.currentProject.algorithms["ram"].replayMemory, shine.ReplayMemory)
+
+    def test_add_experience_state_dimension(self):
+        self.request({"request": "new algorithm", "algorithmClass": "HogwildQLearner", "algorithmName": "hogwild", "numActions": 4,
+                      "stateSpaceShape": [5, 5]})
+        response = self.request({"request": "add experience", "algorithmName": "hogwild", "experienceList": [[[1, 2, 3], 0, 1.0, [1, 2, 3]]]})
+        self.assertEqual(response["response"], "error")
+
+    def test_add_experience_merges_queued_uploads(self):
+        # a thread pool that only executes its calls when told to
+        calls = []
+        thread_pool = mock.Mock()
+        thread_pool.callInThreadWithCallback = lambda on_result, f, *args: calls.append((on_result, f, args))
+        self.protocol.factory = mock.Mock(algorithmThreadPool=thread_pool)
+        self.request({"request": "new algorithm", "algorithmClass": "DynaQLearner", "algorithmName": "dyna", "numActions": 2})
+        algo = self.protocol.currentProject.algorithms["dyna"]
+        algo.numPlanningSteps = 0
+        with mock.patch.object(server_protocol, "reactor", mock.Mock(callFromThread=lambda f, *args: f(*args))):
+            for x in range(5):
+                self.request({"request": "add experience", "algorithmName": "dyna", "experienceList": [[[x], 1, 0.0, [x + 1]]]})
+            # the first upload is running, all others got merged into one queued run
+            self.assertEqual(len(calls), 1)
+            num_calls = 0
+            while len(calls) > 0:
+                on_result, f, args = calls.pop(0)
+                on_result(True, f(*args))
+                num_calls += 1
+        self.assertEqual(num_calls, 2)
+        self.assertEqual(len(algo.model), 5)
+        self.assertEqual(algo.numUpdates, 5)
+        self.assertEqual(self.protocol.currentProject._v_PendingUploads, {})
+
+    def test_add_experience_merges_only_matching_options(self):
+        calls = []
+        thread_pool = mock.Mock()
+        thread_pool.callInThreadWithCallback = lambda on_result, f, *args: calls.append((on_result, f, args))
+        self.protocol.factory = mock.Mock(algorithmThreadPool=thread_pool)
+        self.request({"request": "new algorithm", "algorithmClass": "DynaQLearner", "algorithmName": "dyna", "numActions": 2})
+        algo = self.protocol.currentProject.algorithms["dyna"]
+        algo.numPlanningSteps = 0
+        run_options = []
+        execute_run = self.protocol.currentProject.execute_run
+
+        def recording_execute_run(algo, options, thread_pool, job):
+            run_options.append(options())
+            return execute_run(algo, lambda: run_options[-1], thread_pool, job)
+
+        # the 2nd and 3rd upload get merged (adding up their planning steps), the 4th starts a new episode, the 5th and 6th get merged
+        uploads = [{}, {"numPlanningSteps": 3}, {"numPlanningSteps": 4}, {"newEpisode": True}, {}, {}]
+        with mock.patch.object(server_protocol, "reactor", mock.Mock(callFromThread=lambda f, *args: f(*args))), \
+                mock.patch.object(self.protocol.currentProject, "execute_run", recording_execute_run):
+            for x, options in enumerate(uploads):
+                self.request({"request": "add experience", "algorithmName": "dyna", "experienceList": [[[x], 1, 0.0, [x + 1]]],
+                              "options": options})
+            while len(calls) > 0:
+                on_result, f, args = calls.pop(0)
+                on_result(True, f(*args))
+        self.assertEqual([{key: value for key, value in options.items() if key != "experiences"} for options in run_options],
+                         [{}, {"numPlanningSteps": 7}, {"newEpisode": True}, {}])
+        self.assertEqual([len(options["experiences"]) for options in run_options], [1, 2, 1, 2])
+        self.assertEqual(algo.numUpdates, 6 + 7)
+        self.assertEqual(self.protocol.currentProject._v_PendingUploads, {})
+
+    def test_run_options(self):
+        self.request({"request": "new algorithm", "algorithmClass": "DynaQLearner", "algorithmName": "dyna", "numActions": 2})
+        for options in [[], {"numPlanningSteps": "many"}, {"numPlanningSteps": True}, {"numPlanningSteps": -1},
+                        {"numPlanningSteps": conf.SHINE_SERVER_MAX_NUM_PLANNING_STEPS + 1}, {"experiences": []}]:
+            with self.assertRaises(ShineProtocolClientMessageError):
+                self.request({"request": "run algorithm", "algorithmName": "dyna", "options": options})
+            with self.assertRaises(ShineProtocolClientMessageError):
+                self.request({"request": "add experience", "algorithmName": "dyna", "experienceList": [], "options": options})
+        self.assertEqual(self.protocol.userRecord.jobs, {})
+
+    def test_send_binary_frame_layout(self):
+        frames = []
+        self.protocol.sendMessage = lambda payload, isBinary=False: frames.append((payload, isBinary))
+        states = np.array([[1, 2], [3, 4], [5, 6]], dtype=np.int32)  # 24 bytes
+        q_values = np.arange(15, dtype=np.float32).reshape(3, 5)  # 60 bytes (gets padded)
+        flags = np.array([True, False, True])  # 3 bytes (gets padded)
+        self.protocol.send_binary({"notify": "q-table sync", "version": 3}, states=states, qValues=q_values, flags=flags)
+        frame, is_binary = frames[0]
+        self.assertTrue(is_binary)
+        # uint32 header length, then the json header, padded so that the first array starts at a multiple of 8
+        header_length = struct.unpack("<I", frame[:4])[0]
+        self.assertEqual((4 + header_length) % 8, 0)
+        header = json.loads(frame[4:4 + header_length].decode("utf-8"))
+        self.assertEqual((header["notify"], header["version"], header["msgType"], header["origin"]), ("q-table sync", 3, "notify", "server"))
+        self.assertEqual(header["arrays"], [["states", "int32", [3, 2]], ["qValues", "float32", [3, 5]], ["flags", "bool", [3]]])
+        # each array starts 8-byte aligned and holds the little-endian data
+        offset = 4 + header_length
+        for (name, dtype, shape), array in zip(header["arrays"], [states, q_values, flags]):
+            self.assertEqual(offset % 8, 0)
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            decoded = np.frombuffer(frame, dtype=np.dtype(dtype).newbyteorder("<"), count=int(np.prod(shape)), offset=offset).reshape(shape)
+            np.testing.assert_array_equal(decoded, array)
+            offset += size + (-size % 8)
+        self.assertEqual(offset, len(frame))
+
+
+if __name__ == '__main__':
+    unittest.main()
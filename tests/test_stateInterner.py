@@ -0,0 +1,21 @@
+import unittest
+from shine import StateInterner
+
+
+class TestStateInterner(unittest.TestCase):
+    def test_intern(self):
+        t = StateInterner()
+        self.assertEqual(t.intern((1, 2)), 0)
+        self.assertEqual(t.intern((1, 3)), 1)
+        self.assertEqual(t.intern((1, 2)), 0)
+        self.assertEqual(len(t), 2)
+        self.assertEqual(t.get_state(1), (1, 3))
+
+    def test_intern_items(self):
+        t = StateInterner()
+        items = t.intern_items([((1, 2), 6, -1, (1, 3)), ((1, 3), 5, -1, (1, 3))])
+        self.assertEqual(items, [(0, 6, -1, 1), (1, 5, -1, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+import unittest
+from shine import ValueIterationQLearner, TabularDeterministicWorldModel, QTable, DenseQTable
+from tests.corridor import get_corridor_experiences
+
+
+class TestValueIterationQLearner(unittest.TestCase):
+    def test_run(self):
+        for sweep_mode in ["synchronous", "gauss-seidel"]:
+            for q_table in [QTable(2), DenseQTable((5,), 2)]:
+                algo = ValueIterationQLearner("vi", lambda obj: None, gamma=0.5, sweep_mode=sweep_mode, block_size=2)
+                algo.qFunction = q_table
+                algo.model = TabularDeterministicWorldModel(2)
+                algo.run({"experiences": get_corridor_experiences()})
+                self.assertAlmostEqual(algo.qFunction.get_q_value((3,), 1), 10.0)
+                self.assertAlmostEqual(algo.qFunction.get_q_value((2,), 1), 5.0)
+                self.assertAlmostEqual(algo.qFunction.get_q_value((2,), 0), 1.25)
+                self.assertAlmostEqual(algo.qFunction.get_q_value((0,), 0), 0.625)
+
+
+if __name__ == '__main__':
+    unittest.main()
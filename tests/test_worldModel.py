@@ -0,0 +1,44 @@
+import unittest
+from shine import TabularDeterministicWorldModel
+
+
+class TestTabularDeterministicWorldModel(unittest.TestCase):
+    def test_get_sar_leading_to_s_(self):
+        m = TabularDeterministicWorldModel(4)
+        m.update((0, 0), 1, -1.0, (0, 1))
+        m.update((1, 1), 3, -1.0, (0, 1))
+        m.update((0, 1), 2, 5.0, (1, 1))
+        self.assertEqual(sorted(m.get_sar_leading_to_s_((0, 1))), [((0, 0), 1, -1.0), ((1, 1), 3, -1.0)])
+        self.assertEqual(m.get_sar_leading_to_s_((5, 5)), [])
+
+    def test_overwrite(self):
+        m = TabularDeterministicWorldModel(4)
+        m.update((0, 0), 1, -1.0, (0, 1))
+        m.update((0, 0), 1, 2.0, (1, 0))
+        self.assertEqual(m.get_sar_leading_to_s_((0, 1)), [])
+        self.assertEqual(m.get_sar_leading_to_s_((1, 0)), [((0, 0), 1, 2.0)])
+        self.assertEqual(m.get((0, 0), 1), (2.0, (1, 0)))
+        m.clear()
+        self.assertEqual(m.get_sar_leading_to_s_((1, 0)), [])
+
+    def test_to_arrays(self):
+        m = TabularDeterministicWorldModel(2)
+        m.update((0,), 1, 1.0, (1,))
+        states, next_states, rewards = m.to_arrays()
+        self.assertEqual(states, [(0,), (1,)])
+        self.assertEqual(next_states.tolist(), [[-1, 1], [-1, -1]])
+        self.assertEqual(rewards.tolist(), [[0.0, 1.0], [0.0, 0.0]])
+
+    def test_sample_transitions(self):
+        m = TabularDeterministicWorldModel(2)
+        m.update((0,), 1, 1.0, (1,))
+        m.update((0,), 1, 2.0, (2,))
+        states, actions, rewards, next_states = m.sample_transitions(3)
+        self.assertEqual(states, [(0,)] * 3)
+        self.assertEqual(actions.tolist(), [1] * 3)
+        self.assertEqual(rewards.tolist(), [2.0] * 3)
+        self.assertEqual(next_states, [(2,)] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()